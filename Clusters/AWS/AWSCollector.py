@@ -2,14 +2,16 @@ import sys
 import os
 sys.path.append(os.path.abspath('../'))
 from datetime import datetime, timedelta
-import boto3
 from botocore.exceptions import ClientError
+import numpy as np
 import pandas as pd
 
-from Clusters import BaseCollector
+from Clusters.BaseCollector import BaseCollector, CollectionError
+from Clusters.FrameBuilder import FrameBuilder
+from Clusters.FrameAligner import align_frames
+from .AsyncAWSClient import AWSClientPool, default_max_workers
 import logging
 
-logging.basicConfig(filename='Logs/log.log', format='%(message)s', filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from pandas import DataFrame
@@ -20,195 +22,369 @@ import asyncio
 import time
 
 
-class AWSCollector(BaseCollector):
+# GetMetricData accepts at most 500 queries per call
+max_queries_per_call = 500
+# (metric name, stat, column name) of the Lambda metrics collected for every function
+lambda_metrics = (
+    ("Duration", "Average", "execution_times"),
+    ("Invocations", "Sum", "invocations"),
+    ("ConcurrentExecutions", "Sum", "concurrent_invocations"),
+    ("PostRuntimeExtensionsDuration", "Average", "post_runtime_duration"),
+)
+
+lambda_log_group_prefix = "/aws/lambda/"
+# a Logs Insights query spans at most 50 log groups, @log tells the function of a row
+max_log_groups_per_query = 50
+# concurrent Logs Insights queries of a collector, the default account limit is 30
+max_concurrent_log_queries = 10
+# seconds between polls of a running query, doubled up to the maximum
+log_query_poll_interval = 0.5
+log_query_max_poll_interval = 5
+# Logs Insights returns at most this many rows of a query, a query which reaches it is split
+max_log_query_rows = 10000
+log_query = ("fields @timestamp, @log, @billedDuration, @duration, @ingestionTime, @maxMemoryUsed, @memorySize "
+             "| limit " + str(max_log_query_rows))
+# aggregates the REPORT lines on the server, one row per function and period instead of one per invocation
+log_stats_query = ('filter @type = "REPORT" '
+                   '| stats count(*) as invocations_logged, avg(@duration) as avg_duration, '
+                   'pct(@duration, 50) as p50_duration, pct(@duration, 90) as p90_duration, '
+                   'pct(@duration, 99) as p99_duration, avg(@billedDuration) as billed_duration, '
+                   'avg(@maxMemoryUsed) as mem_usage_mb, max(@maxMemoryUsed) as max_mem_usage_mb, '
+                   'max(@memorySize) as memory, count(@initDuration) as cold_starts, '
+                   'avg(@initDuration) as init_duration '
+                   'by bin({period}s), @log '
+                   '| limit ' + str(max_log_query_rows))
+# column of the stats query -> divisor, the memory fields are reported in bytes
+log_stats_columns = {
+    "invocations_logged": 1, "avg_duration": 1, "p50_duration": 1, "p90_duration": 1, "p99_duration": 1,
+    "billed_duration": 1, "mem_usage_mb": 10 ** 6, "max_mem_usage_mb": 10 ** 6, "memory": 10 ** 6,
+    "cold_starts": 1, "init_duration": 1,
+}
+# how the metric and log frames are joined on the grid of the period, counts are summed and are 0 if missing
+frame_aggregations = {"invocations": "sum", "invocations_logged": "sum", "cold_starts": "sum"}
+frame_fill = {"invocations": 0, "invocations_logged": 0, "cold_starts": 0, "memory": "ffill"}
+
 
-    def __init__(self):
+class AWSCollector(BaseCollector):
 
-        self.cloudwatch_client = boto3.client('cloudwatch')
+    def __init__(self, max_workers: int = default_max_workers,
+                 max_log_queries: int = max_concurrent_log_queries, log_aggregation: bool = True):
+        """
+        Args:
+            max_workers:
+                Integer, optional - maximum number of concurrent AWS API calls
+            max_log_queries:
+                Integer, optional - maximum number of concurrent Logs Insights queries
+            log_aggregation:
+                bool, optional - aggregate the logs per period on the server (count, percentiles, cold starts),
+                otherwise every log record is fetched and averaged on the client
+        """
+        # clients are created on first use, their blocking calls run in a bounded thread pool
+        self.clients = AWSClientPool(max_workers)
+        self.log_query_semaphore = asyncio.Semaphore(max_log_queries)
+        self.log_aggregation = log_aggregation
         self.metric_namespace = "AWS/Lambda"
         self.period = 60
 
+    async def close(self) -> None:
+        # waits for running calls in a thread, not on the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.clients.close)
+
     def init(self, prometheus_url: str, kubernetes_prom_url):
         pass
 
-    async def get_and_convert_data_frame(self, config_object: object, start: int, end: int, stat_type: str,
-                                         feature_col_name: str, save_feature_col_name: str) -> DataFrame:
-        """ Get and Convert the timeseries data values to a dataframe .
-        Args:
-            config_object:
-                config_object - The GoogleCloudTarget, for which the collector should use
-            start:
-                Integer - A timestamp, where the query range should start
-            end:
-                Integer - A timestamp, where the query range should end
-           feature_col_name:
-               String - name of the feature column name
-        Returns:
-           DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
-           'feature_col_name'
+    def metric_query(self, query_id: str, stat_type: str, feature_col_name: str) -> dict:
+        """ Builds a GetMetricData query which searches a metric of all Lambda functions """
+        return {
+            'Id': query_id,
+            'Expression': "SEARCH('{" +
+                          self.metric_namespace+",FunctionName} "
+                                                "MetricName=\"" +
+                          feature_col_name+"\"', '"+stat_type+"', "+str(self.period)+")",
+            'ReturnData': True
+        }
+
+    def plan_metric_queries(self, metrics: tuple) -> Tuple[list, dict]:
+        """ Packs metric/stat pairs into as few GetMetricData calls as possible
+            Args:
+                metrics:
+                    tuple - (metric name, stat, column name) tuples
+            Returns:
+                tuple - list of batches of at most max_queries_per_call queries, query Id -> column name
         """
-        stats = self.cloudwatch_client.get_metric_data(
-            MetricDataQueries=[
-                {
-                    'Id': 'metric_data',
-                    'Expression': "SEARCH('{" +
-                                  self.metric_namespace+",FunctionName} "
-                                                        "MetricName=\"" +
-                                  feature_col_name+"\"', '"+stat_type+"', "+str(self.period)+")",
-                    'ReturnData': True
-                },
-            ],
-            StartTime=start,
-            EndTime=end,
-            ScanBy='TimestampDescending'
-        )
-        values = []
-        for record in stats['MetricDataResults']:
-            for idx, inner_record in enumerate(record['Timestamps']):
-                values.append(
-                    {"action": record['Label'], "timestamp": inner_record, save_feature_col_name: record['Values'][idx]})
-
-        return DataFrame(values)
-
-    async def collect_invocations(self, config_object: object, start: int, end: int) -> DataFrame:
-        """ Collects the number of active instances for GCF Function.
-        Args:
-            config_object:
-                config_object - The GoogleCloudTarget, for which the collector should use
-            start:
-                Integer - A timestamp, where the query range should start
-            end:
-                Integer - A timestamp, where the query range should end
-        Returns:
-            DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
-            'active_instances'
+        queries = []
+        columns = {}
+        for idx, (feature_col_name, stat_type, save_feature_col_name) in enumerate(metrics):
+            query_id = "m" + str(idx)
+            queries.append(self.metric_query(query_id, stat_type, feature_col_name))
+            columns[query_id] = save_feature_col_name
+        batches = [queries[idx:idx + max_queries_per_call] for idx in range(0, len(queries), max_queries_per_call)]
+        return batches, columns
+
+    async def get_metric_data_pages(self, config_object: object, queries: list, start: int, end: int) -> list:
+        """ Runs one GetMetricData batch and follows NextToken until all pages are read
+            Returns:
+                list - MetricDataResults of all pages
         """
-
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'Sum',
-                                                          'Invocations', 'invocations')
-
-        return result_df
-
-    async def collect_concurrency_invocations(self, config_object: object, start: int, end: int) -> DataFrame:
-        """ Collects the number of active instances for GCF Function.
-        Args:
-            config_object:
-                config_object - The GoogleCloudTarget, for which the collector should use
-            start:
-                Integer - A timestamp, where the query range should start
-            end:
-                Integer - A timestamp, where the query range should end
-        Returns:
-            DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
-            'active_instances'
+        client = self.clients.get('cloudwatch', config_object)
+        results = []
+        next_token = None
+        while True:
+            request = {"MetricDataQueries": queries, "StartTime": start, "EndTime": end,
+                       "ScanBy": 'TimestampDescending'}
+            if next_token:
+                request["NextToken"] = next_token
+            stats = await client.get_metric_data(**request)
+            results.extend(stats['MetricDataResults'])
+            next_token = stats.get('NextToken')
+            if not next_token:
+                return results
+
+    async def get_metric_frames(self, config_object: object, start: int, end: int,
+                                metrics: tuple = lambda_metrics) -> dict:
+        """ Queries metrics of all Lambda functions in batched and paginated GetMetricData calls
+            Args:
+                config_object:
+                    config_object - configuration of the cluster, selects the account and region of the client
+                start:
+                    Integer - A timestamp, where the query range should start
+                end:
+                    Integer - A timestamp, where the query range should end
+                metrics:
+                    tuple, optional - (metric name, stat, column name) tuples
+            Returns:
+                dict - column name -> DataFrame with the columns 'timestamp' (epoch seconds), 'action' and the column
         """
-
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'Sum',
-                                                          'ConcurrentExecutions', 'concurrent_invocations')
-
-        return result_df
-
-    async def collect_post_runtime_duration(self, config_object: object, start: int, end: int) -> DataFrame:
-        """ Collects the number of active instances for GCF Function.
-        Args:
-            config_object:
-                config_object - The GoogleCloudTarget, for which the collector should use
-            start:
-                Integer - A timestamp, where the query range should start
-            end:
-                Integer - A timestamp, where the query range should end
-        Returns:
-            DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
-            'active_instances'
+        batches, columns = self.plan_metric_queries(metrics)
+        pages = await asyncio.gather(*[self.get_metric_data_pages(config_object, queries, start, end)
+                                       for queries in batches])
+
+        # results of one query may be split over several pages and series, demultiplex them by query Id
+        builders = {query_id: FrameBuilder((column,)) for query_id, column in columns.items()}
+        for results in pages:
+            for record in results:
+                timestamps = np.fromiter((int(timestamp.timestamp()) for timestamp in record['Timestamps']),
+                                         dtype=np.int64, count=len(record['Timestamps']))
+                builders[record['Id']].add_block(timestamps, {"action": record['Label']},
+                                                 {columns[record['Id']]: record['Values']})
+
+        return {columns[query_id]: builder.build() for query_id, builder in builders.items()}
+
+    async def run_logs_query(self, config_object: object, log_groups: list, start: int, end: int,
+                             query: str) -> list:
+        """ Runs one Logs Insights query and polls its results with exponential backoff
+        At most max_concurrent_log_queries queries of the collector run at the same time, Logs Insights limits the
+        number of concurrent queries per account.
+            Args:
+                config_object:
+                    config_object - configuration of the cluster, selects the account and region of the client
+                log_groups:
+                    list - at most max_log_groups_per_query log group names
+                start:
+                    Integer - A timestamp, where the query range should start
+                end:
+                    Integer - A timestamp, where the query range should end
+                query:
+                    String - the Logs Insights query
+            Returns:
+                list - the result rows, each a list of {'field': ..., 'value': ...}
         """
-
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'Average',
-                                                          'PostRuntimeExtensionsDuration', 'post_runtime_duration')
-
-        return result_df
-
-    async def collect_execution_times(self, config_object: object, start: int, end: int) -> DataFrame:
-        """ Collects the execution times of AWS Lambda functions.
-        Args:
-            config_object:
-                config_object - The GoogleCloudTarget, for which the collector should use
-            start:
-                Integer - A timestamp, where the query range should start
-            end:
-                Integer - A timestamp, where the query range should end
-        Returns:
-            DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
-            'execution_times'
+        client = self.clients.get('logs', config_object)
+        async with self.log_query_semaphore:
+            start_query_response = await client.start_query(
+                logGroupNames=log_groups,
+                startTime=start,
+                endTime=end,
+                queryString=query,
+            )
+            query_id = start_query_response['queryId']
+
+            delay = log_query_poll_interval
+            while True:
+                await asyncio.sleep(delay)
+                response = await client.get_query_results(queryId=query_id)
+                if response['status'] not in ('Scheduled', 'Running'):
+                    break
+                logger.debug('Waiting for query %s to complete ...', query_id)
+                delay = min(delay * 2, log_query_max_poll_interval)
+
+        if response['status'] != 'Complete':
+            raise CollectionError("Logs Insights query %s over %d log groups ended with status %s" %
+                                  (query_id, len(log_groups), response['status']))
+        return response.get('results') or []
+
+    async def query_logs(self, config_object: object, log_groups: list, start: int, end: int, query: str) -> list:
+        """ Runs a Logs Insights query and splits it until no result reaches max_log_query_rows
+        A query which reaches the row cap, e.g. the stats query over many functions and a long window, is split into
+        two halves of its time range at a multiple of the period, a query within a single period into two halves of
+        its log groups. A chunk with a log group which does not
+        exist, e.g. of a deleted function, is split the same way and the missing log group is skipped.
+            Args:
+                config_object:
+                    config_object - configuration of the cluster, selects the account and region of the client
+                log_groups:
+                    list - at most max_log_groups_per_query log group names
+                start:
+                    Integer - A timestamp, where the query range should start
+                end:
+                    Integer - A timestamp, where the query range should end, inclusive
+                query:
+                    String - the Logs Insights query
+            Returns:
+                list - the result rows of all queries
         """
+        try:
+            results = await self.run_logs_query(config_object, log_groups, start, end, query)
+            if len(results) < max_log_query_rows:
+                return results
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') != 'ResourceNotFoundException':
+                raise
+            if len(log_groups) == 1:
+                logger.info("Skipping log group %s, it does not exist", log_groups[0])
+                return []
+            results = None
+
+        if results is not None and end - start > self.period:
+            # split at a bin boundary of the stats query, the percentiles of a bin can not be merged
+            middle = max((start + end) // 2 // self.period, start // self.period + 1) * self.period
+            parts = [(log_groups, start, middle - 1), (log_groups, middle, end)]
+        elif len(log_groups) > 1:
+            half = len(log_groups) // 2
+            parts = [(log_groups[:half], start, end), (log_groups[half:], start, end)]
+        else:
+            logger.warning("Logs Insights query of %s from %d to %d reached %d rows, the result is truncated",
+                           log_groups[0], start, end, len(results))
+            return results
+
+        split_results = await asyncio.gather(*[self.query_logs(config_object, groups, part_start, part_end, query)
+                                               for groups, part_start, part_end in parts])
+        return [row for part in split_results for row in part]
+
+    def convert_log_results(self, results: list) -> DataFrame:
+        """ Converts Logs Insights rows of many functions to a frame with the mean per function and period
+            Returns:
+                DataFrame - with columns: 'timestamp', 'action', 'billed_duration', 'mem_usage_mb', 'memory'
+        """
+        count = len(results)
+        timestamps = np.empty(count, dtype=object)
+        actions = np.empty(count, dtype=object)
+        billed_duration = np.full(count, np.nan)
+        mem_usage_mb = np.full(count, np.nan)
+        memory = np.full(count, np.nan)
+        for idx, log in enumerate(results):
+            for record in log:
+
+                if "timestamp" in record['field']:
+                    timestamps[idx] = record['value']
+
+                elif record['field'] == "@log":
+                    # <account id>:/aws/lambda/<function name>
+                    actions[idx] = record['value'].rsplit(lambda_log_group_prefix, 1)[-1]
+
+                elif "billedDuration" in record['field']:
+                    billed_duration[idx] = float(record['value'])
+
+                elif "maxMemoryUsed" in record['field']:
+                    mem_usage_mb[idx] = float(record['value']) / 10 ** 6
+
+                elif "memorySize" in record['field']:
+                    memory[idx] = float(record['value']) / 10 ** 6
+
+        keep = billed_duration > 0
+        builder = FrameBuilder(("billed_duration", "mem_usage_mb", "memory"), timestamp_dtype=object)
+        builder.add_block(timestamps[keep], {"action": actions[keep]},
+                          {"billed_duration": billed_duration[keep], "mem_usage_mb": mem_usage_mb[keep],
+                           "memory": memory[keep]})
+        df = builder.build()
+        if df.empty:
+            return df
 
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'Average',
-                                                          'Duration', 'execution_times')
-
-        return result_df
-
-    def collect_data_from_logs(self, func_name: str, start: int, end: int):
-        client = boto3.client('logs')
-
-        query = "fields @timestamp, @billedDuration, @duration, @ingestionTime, @maxMemoryUsed, @memorySize"
-
-        log_group = '/aws/lambda/' + func_name
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+        df.set_index("timestamp", inplace=True)
+        df = df.groupby("action", observed=True)[["billed_duration", "mem_usage_mb", "memory"]] \
+            .resample(str(self.period) + 's').mean()
 
-        start_query_response = client.start_query(
-            logGroupName=log_group,
-            startTime=start,
-            endTime=end,
-            queryString=query,
-        )
+        df.reset_index(inplace=True)
+        df = df.dropna(how='any')
+        df.reset_index(inplace=True, drop=True)
+        return df
 
-        query_id = start_query_response['queryId']
+    def convert_log_stats(self, results: list) -> DataFrame:
+        """ Converts the rows of the stats query, one per function and period
+            Returns:
+                DataFrame - with columns: 'timestamp', 'action' and the columns of log_stats_columns
+        """
+        count = len(results)
+        timestamps = np.empty(count, dtype=object)
+        actions = np.empty(count, dtype=object)
+        values = {column: np.full(count, np.nan) for column in log_stats_columns}
+        for idx, log in enumerate(results):
+            for record in log:
+                if record['field'].startswith("bin("):
+                    timestamps[idx] = record['value']
+                elif record['field'] == "@log":
+                    actions[idx] = record['value'].rsplit(lambda_log_group_prefix, 1)[-1]
+                elif record['field'] in log_stats_columns and record['value'] != "":
+                    values[record['field']][idx] = float(record['value']) / log_stats_columns[record['field']]
+
+        builder = FrameBuilder(tuple(log_stats_columns), timestamp_dtype=object)
+        builder.add_block(timestamps, {"action": actions}, values)
+        df = builder.build()
+        if df.empty:
+            return df
 
-        response = None
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+        # periods without a cold start have no init duration
+        df["cold_starts"] = df["cold_starts"].fillna(0)
+        return df
+
+    async def collect_data_from_logs(self, config_object: object, func_names: list, start: int,
+                                     end: int) -> DataFrame:
+        """ Collects the billed duration and memory usage of many functions from their Lambda logs
+        The log groups are queried in chunks of max_log_groups_per_query, all chunks at once, and every chunk is
+        converted as soon as its queries complete, see query_logs for chunks which reach the row cap. A failed chunk
+        fails the whole collection, so the window is collected again. With log_aggregation, the durations are also aggregated to
+        count, average and p50/p90/p99 per period, with the cold starts and their init duration.
+            Args:
+                config_object:
+                    config_object - configuration of the cluster, selects the account and region of the client
+                func_names:
+                    list - names of the Lambda functions
+                start:
+                    Integer - A timestamp, where the query range should start
+                end:
+                    Integer - A timestamp, where the query range should end
+            Returns:
+                DataFrame - with columns: 'timestamp', 'action', 'billed_duration', 'mem_usage_mb', 'memory' and
+                with log_aggregation the other columns of log_stats_columns
+        """
+        if self.log_aggregation:
+            query, convert = log_stats_query.format(period=self.period), self.convert_log_stats
+        else:
+            query, convert = log_query, self.convert_log_results
 
-        while response == None or response['status'] == 'Running':
-            print('Waiting for query to complete ...')
-            time.sleep(1)
-            response = client.get_query_results(
-                queryId=query_id
-            )
+        log_groups = [lambda_log_group_prefix + func_name for func_name in func_names]
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self.query_logs(config_object, log_groups[idx:idx + max_log_groups_per_query],
+                                                start, end, query))
+            for idx in range(0, len(log_groups), max_log_groups_per_query)
+        ]
 
-        values = []
-        if response["results"]:
-            for log in response["results"]:
-                value = {
-                    "timestamp": "",
-                    "billed_duration": "",
-                    "mem_usage_mb": "",
-                    "memory": ""
-                }
-                for record in log:
-
-                    if "timestamp" in record['field']:
-                        value["timestamp"] = record['value']
-
-                    elif "billedDuration" in record['field']:
-                        value["billed_duration"] = float(record['value'])
-
-                    elif "maxMemoryUsed" in record['field']:
-                        value["mem_usage_mb"] = float(record['value']) / 10 ** 6
-
-                    elif "memorySize" in record['field']:
-                        value["memory"] = float(record['value']) / 10 ** 6
-
-                if value["billed_duration"]:
-                    values.append(value)
-
-            df = pd.DataFrame(values)
-            df.set_index("timestamp", inplace=True)
-            df.index = pd.to_datetime(df.index, unit='ns')
-            df = df.resample(str(self.period)+'s').mean()
-
-            df.reset_index(inplace=True)
-            df = df.dropna(how='any')
-            df.reset_index(inplace=True, drop=True)
-            df["action"]= func_name
-            return df
-        else:
-            return pd.DataFrame(values)
+        frames = []
+        try:
+            for result in asyncio.as_completed(tasks):
+                frame = convert(await result)
+                if not frame.empty:
+                    frames.append(frame)
+        finally:
+            # the queries of the other chunks are not needed once one failed
+            for task in tasks:
+                task.cancel()
+
+        if not frames:
+            return DataFrame()
+        return pd.concat(frames, ignore_index=True)
 
     def do_frame_postprocessing(self, frame: DataFrame, cluster_name: str, measurement_category: str) -> DataFrame:
         """ Performs postprocessing on dataframes.
@@ -254,42 +430,17 @@ class AWSCollector(BaseCollector):
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'target', 'action' and measurement fields(s)
         """
-        # start each worker
-        tasks: List[asyncio.Task] = [
-            asyncio.create_task(self.collect_execution_times(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_invocations(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_concurrency_invocations(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_post_runtime_duration(config_object["auth"], start, end))
-        ]
+        # all metrics in one batched call, a failed call fails the window
+        metric_frames = await asyncio.wait_for(self.get_metric_frames(config_object, start, end), timeout=45.0)
+        frames = [frame for frame in metric_frames.values() if not frame.empty]
 
-        # wait for all workers
-        combined_frame = DataFrame()
-        try:
-            # wait for max 45 seconds
-            for result in asyncio.as_completed(tasks, timeout=45.0):
-                frame = await result
-
-                if frame.empty:
-                    continue
-                elif combined_frame.empty:
-                    combined_frame = frame
-                else:
-                    combined_frame = pd.merge(combined_frame, frame, on=['timestamp', 'action'])
-
-        except Exception as e:
-            print("Exception when tyring to query data")
-            print(e)
-            traceback.print_exc()
-
-        combined_frame['timestamp'] = pd.to_datetime(combined_frame['timestamp'], utc=True)
-        for func_name in combined_frame["action"].unique():
-
-            frame = self.collect_data_from_logs(func_name, start, end)
-            frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
-            if frame.empty:
-                continue
-            else:
-                combined_frame = pd.merge(combined_frame, frame, on=['timestamp', 'action'])
+        if frames:
+            for frame in frames:
+                frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s', utc=True)
+            func_names = list(set().union(*(frame["action"].unique() for frame in frames)))
+            frames.append(await self.collect_data_from_logs(config_object, func_names, start, end))
+
+        combined_frame = align_frames(frames, self.period, ("action",), frame_aggregations, frame_fill)
 
         updated_df = self.do_frame_postprocessing(combined_frame, cluster_name, "function_usage")
         return updated_df
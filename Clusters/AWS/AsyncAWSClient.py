@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+# threads shared by all AWS clients of a collector, bounds the number of concurrent AWS API calls
+default_max_workers = 8
+
+
+class AsyncAWSClient:
+    """ Awaitable wrapper around a boto3 client
+    boto3 only offers blocking calls, they run in a bounded thread pool so AWS queries overlap with each other and
+    with the collectors of the other providers instead of blocking the event loop. boto3 clients are thread safe,
+    one client is created on first use and shared by all threads.
+    e.g. `stats = await client.get_metric_data(MetricDataQueries=[...], ...)`
+
+    """
+
+    def __init__(self, service_name: str, executor: ThreadPoolExecutor, **session_options):
+        """
+        Args:
+            service_name:
+                String - boto3 service, e.g. cloudwatch or logs
+            executor:
+                ThreadPoolExecutor - the pool the calls run in
+            session_options:
+                keyword arguments of boto3.session.Session, e.g. aws_access_key_id and region_name
+        """
+        self.service_name = service_name
+        self.executor = executor
+        self.session_options = session_options
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def get_client(self):
+        """ Creates the boto3 client, called from the pool since creating a client reads files and is slow """
+        with self._client_lock:
+            if self._client is None:
+                # boto3 sessions are not thread safe, every client gets its own
+                session = boto3.session.Session(**self.session_options)
+                self._client = session.client(self.service_name)
+            return self._client
+
+    def call_sync(self, method: str, **kwargs):
+        return getattr(self.get_client(), method)(**kwargs)
+
+    async def call(self, method: str, **kwargs):
+        """ Runs a method of the boto3 client in the thread pool and returns its response """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.call_sync, method, **kwargs))
+
+    def __getattr__(self, method: str):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return functools.partial(self.call, method)
+
+
+class AWSClientPool:
+    """ One AsyncAWSClient per service and account/region, all sharing one bounded thread pool """
+
+    def __init__(self, max_workers: int = default_max_workers):
+        self.max_workers = max_workers
+        self.executor = None
+        self.clients = {}
+
+    def get(self, service_name: str, config_object: object = None) -> AsyncAWSClient:
+        """ Returns the client of a service for a cluster
+            Args:
+                service_name:
+                    String - boto3 service, e.g. cloudwatch or logs
+                config_object:
+                    Object, optional - configuration of the cluster, its auth keys and meta region are used if set,
+                    otherwise the default credential chain of boto3
+            Returns:
+                AsyncAWSClient - the client
+        """
+        config_object = config_object or {}
+        auth = config_object.get("auth") or {}
+        session_options = {}
+        if auth.get("aws_access_key_id"):
+            session_options["aws_access_key_id"] = auth["aws_access_key_id"]
+            session_options["aws_secret_access_key"] = auth.get("aws_secret_access_key")
+        region = (config_object.get("meta") or {}).get("region")
+        if region:
+            session_options["region_name"] = region
+
+        key = (service_name, tuple(sorted(session_options.items())))
+        if key not in self.clients:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="aws")
+            self.clients[key] = AsyncAWSClient(service_name, self.executor, **session_options)
+        return self.clients[key]
+
+    def close(self) -> None:
+        """ Waits for running calls and stops the thread pool """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.clients = {}
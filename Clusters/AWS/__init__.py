@@ -1,2 +1,9 @@
-from .AWSDeploy import AWSDeployment
-from .AWSCollector import AWSCollector
\ No newline at end of file
+from Clusters.ProviderRegistry import lazy_attribute
+
+_lazy_exports = {
+    "AWSDeployment": ".AWSDeploy",
+}
+
+
+def __getattr__(name):
+    return lazy_attribute(__name__, _lazy_exports, name)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import hashlib
+import logging
+import os
+import shutil
+
+from .CacheStore import CacheStore
+from .DependencyCache import DependencyCache
+from .DeploymentState import DeploymentState
+from .PhaseRunner import run_phase
+
+logger = logging.getLogger(__name__)
+
+artifacts_root = os.path.join(".cache", "artifacts")
+deploy_commands = ("serverless deploy", "sls deploy")
+
+
+class ArtifactCache(CacheStore):
+    """ Content-addressed cache of serverless packages
+    `serverless package` runs once per function source, provider, runtime and rendered serverless.yml, every
+    cluster with the same key then deploys the prebuilt artifact with `serverless deploy --package`.
+
+    """
+    entry_kind = "artifact cache"
+
+    def __init__(self, root: str = artifacts_root, max_size_bytes: int = 5 * 1024 ** 3):
+        super().__init__(root, max_size_bytes)
+
+    def artifact_key(self, path_function: str, workspace: str, provider: str, dependency_key: str = None) -> str:
+        """ Computes the key of the package of a workspace
+            Args:
+                path_function:
+                    String - path of source code
+                workspace:
+                    String - path of the workspace with the rendered serverless.yml
+                provider:
+                    String - provider name, e.g. aws
+                dependency_key:
+                    String, optional - key of the node_modules of the workspace, see DependencyCache.cache_key
+            Returns:
+                String - hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(provider.encode())
+        digest.update(DependencyCache.get_runtime(workspace).encode())
+        digest.update(DeploymentState.source_digest(path_function).encode())
+        # node_modules is part of the package but not of the source digest
+        digest.update((dependency_key or '').encode())
+        # the package embeds service name, memory, region etc., so it is only shared between equal configurations
+        with open(os.path.join(workspace, 'serverless.yml'), 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    async def package(self, path_function: str, workspace: str, provider: str, env: dict = None,
+                      dependency_key: str = None, **options) -> str:
+        """ Asynchronous function which provides the package of a workspace, building it if it is not cached yet
+            Args:
+                path_function:
+                    String - path of source code
+                workspace:
+                    String - path of the workspace, its dependencies have to be installed already
+                provider:
+                    String - provider name, e.g. aws
+                env:
+                    dict, optional - environment of the serverless package process
+                dependency_key:
+                    String, optional - key of the node_modules of the workspace, see DependencyCache.cache_key
+                options:
+                    keyword arguments of run_phase, e.g. timeouts
+            Returns:
+                String - absolute path of the artifact directory, or None if packaging failed
+        """
+        key = self.artifact_key(path_function, workspace, provider, dependency_key)
+        async with self.lock(key):
+            if self.is_complete(key):
+                logger.debug("Artifact cache hit %s for %s", key, workspace)
+            else:
+                staging = os.path.abspath(self.staging_path(key))
+                shutil.rmtree(staging, ignore_errors=True)
+                logger.info("Packaging %s into artifact %s", workspace, key)
+                if not await run_phase(["serverless package --package " + staging], workspace, env, **options):
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return None
+                if not await self.commit(staging, key):
+                    return None
+            self.touch(key)
+
+        self.evict()
+        return os.path.abspath(self.entry_path(key))
+
+    @staticmethod
+    def uses_deploy(commands: list) -> bool:
+        return any(command.strip().startswith(deploy_commands) for command in commands)
+
+    @staticmethod
+    def deploy_from_artifact(commands: list, artifact: str) -> list:
+        """ Rewrites the serverless deploy commands of a phase to deploy the given artifact """
+        rewritten = []
+        for command in commands:
+            if command.strip().startswith(deploy_commands) and "--package" not in command.split():
+                command = command + " --package " + artifact
+            rewritten.append(command)
+        return rewritten
@@ -2,6 +2,10 @@ from abc import abstractmethod
 from pandas import DataFrame
 
 
+class CollectionError(Exception):
+    """ Raised by collect when a window could not be collected completely, the window is collected again """
+
+
 class BaseCollector:
     """Abstract DataCollector class
     It serves as a base  class for all the deployment classes for particular clusters
@@ -10,6 +14,11 @@ class BaseCollector:
 
     @abstractmethod
     async def collect(self, config_object: object, cluster_name: str, start: int, end: int) -> DataFrame:
+        """ Collects the metrics of a cluster from start to end, raises instead of returning a partial frame """
+        pass
+
+    async def close(self) -> None:
+        """ Releases the clients of the collector, e.g. thread pools and sessions """
         pass
 
     @abstractmethod
@@ -1,4 +1,18 @@
 from abc import abstractmethod
+import logging
+import os
+import yaml
+
+from .ArtifactCache import ArtifactCache
+from .DependencyCache import DependencyCache
+from .DeploymentState import DeploymentState
+from .DeploymentTimer import DeploymentTimer
+from .EndpointRegistry import EndpointRegistry, EndpointCapture, endpoints_by_function
+from .PhaseRunner import run_phase, phase_options
+from .Workspace import prepare_workspace, render_serverless_yaml, write_rendered_file, function_name, \
+    deployment_name
+
+logger = logging.getLogger(__name__)
 
 
 class BaseDeployment:
@@ -6,15 +20,235 @@ class BaseDeployment:
     It serves as a base  class for all the deployment classes for particular clusters
 
     """
+    provider = None
+
+    def __init__(self, dependency_cache: DependencyCache = None, deployment_state: DeploymentState = None,
+                 artifact_cache: ArtifactCache = None, endpoint_registry: EndpointRegistry = None):
+        """
+        Args:
+            dependency_cache:
+                DependencyCache, optional - node_modules cache, share one instance between all deployments of a run
+            deployment_state:
+                DeploymentState, optional - store of the last successful deployments
+            artifact_cache:
+                ArtifactCache, optional - cache of serverless packages, share one instance between all deployments
+            endpoint_registry:
+                EndpointRegistry, optional - store of the endpoints of the deployed functions
+        """
+        self.dependency_cache = dependency_cache or DependencyCache()
+        self.deployment_state = deployment_state or DeploymentState()
+        self.artifact_cache = artifact_cache or ArtifactCache()
+        self.endpoint_registry = endpoint_registry or EndpointRegistry()
+        # timing records of all finished deployments and removals
+        self.timings = []
 
     @abstractmethod
-    async def authentication(self, config_object: object,  init_phase_commands: list, path_function: str):
+    async def authentication(self, config_object: object, path_function: str) -> dict:
         pass
 
     @abstractmethod
-    async def deploy(self, config_object: object, path_directory: str) -> str:
+    def update_serverless_yaml(self, yaml_data: dict, config_object: object) -> dict:
         pass
 
-    @abstractmethod
-    async def delete(self, config_object: object, path_directory: str) -> str:
-        pass
\ No newline at end of file
+    async def deploy(self, config_object: object, path_function: str, cluster_name: str, force: bool = False) -> str:
+        """ Asynchronous function which creates the deployment of the serverless function using serverless framework
+            Args:
+                config_object:
+                    Object - configuration of the cluster
+                path_function
+                    string - path of source code
+                cluster_name
+                    string - name of the cluster
+                force
+                    bool - deploy even if the function and its configuration did not change
+            Returns:
+                String - result of the deployment
+        """
+        timer = self.create_timer(path_function, cluster_name, "deploy")
+        serverless_yaml = self.render_yaml(config_object, path_function, timer)
+        name = deployment_name(cluster_name, path_function)
+        # the workspace of an unchanged deployment is left as it is
+        digest = self.deployment_state.digest(path_function, serverless_yaml, self.provider, config_object["auth"],
+                                              config_object["phases"])
+        if not force and self.deployment_state.is_up_to_date(self.provider, name, digest):
+            logger.info("%s/%s is up to date, skipping deployment", self.provider, name)
+            return self.finish_timer(timer, "Up-to-date")
+        workspace = self.stage(path_function, cluster_name, serverless_yaml, timer)
+
+        # Step 1: Export authorization and install the dependencies
+        env = await self.init_stage(config_object, workspace, timer)
+        if env is None:
+            return self.finish_timer(timer, "Failed")
+
+        # Step 2: Package once per function and configuration
+        options = phase_options(config_object, "post_init")
+        dependency_key = self.dependency_cache.cache_key(workspace, config_object["phases"]["init"]["commands"])
+        with timer.span("package"):
+            commands = await self.package_stage(config_object["phases"]["post_init"]["commands"], path_function,
+                                                workspace, env, dependency_key,
+                                                on_event=timer.command_events("package"), **options)
+
+        # Step 3: Final Deploy
+        capture = EndpointCapture(timer.command_events("post_init"))
+        with timer.span("post_init"):
+            success = await run_phase(commands, workspace, env, on_event=capture, **options)
+        if success:
+            self.deployment_state.record(self.provider, name, digest)
+            self.record_endpoints(workspace, name, capture.urls)
+
+        return self.finish_timer(timer, "Deployed" if success else "Failed")
+
+    async def delete(self, config_object: object, path_function: str, cluster_name: str) -> str:
+        """ Asynchronous function which removes the serverless function from a cluster
+            Args:
+                config_object:
+                    Object - configuration of the cluster
+                path_function
+                    string - path of source code
+                cluster_name
+                    string - name of the cluster
+            Returns:
+                String - result of the removal
+        """
+        timer = self.create_timer(path_function, cluster_name, "delete")
+        workspace = self.stage(path_function, cluster_name, self.render_yaml(config_object, path_function, timer),
+                               timer)
+
+        # Step 1: Export authorization and install the dependencies
+        env = await self.init_stage(config_object, workspace, timer)
+        if env is None:
+            return self.finish_timer(timer, "Failed")
+
+        # Step 2: Final Delete
+        with timer.span("delete"):
+            success = await run_phase(config_object["phases"]["delete"]["commands"], workspace, env,
+                                      on_event=timer.command_events("delete"), **phase_options(config_object, "delete"))
+        if success:
+            self.deployment_state.forget(self.provider, deployment_name(cluster_name, path_function))
+            self.endpoint_registry.forget(self.provider, deployment_name(cluster_name, path_function))
+
+        return self.finish_timer(timer, "Deleted" if success else "Failed")
+
+    async def init_stage(self, config_object: object, workspace: str, timer: DeploymentTimer) -> dict:
+        """ Exports the credentials of the cluster and runs the init phase, at most once per package-lock.json
+            Args:
+                config_object:
+                    Object - configuration of the cluster
+                workspace
+                    string - path of the workspace
+                timer
+                    DeploymentTimer - records the authentication and init spans and the init commands
+            Returns:
+                dict - environment of the serverless processes with the cluster credentials, None if the init
+                phase failed
+        """
+        with timer.span("authentication"):
+            env = await self.authentication(config_object["auth"], workspace)
+
+        # the init span is recorded on a dependency cache hit too, when no init command runs
+        with timer.span("init"):
+            installed = await self.dependency_cache.install(config_object["phases"]["init"]["commands"], workspace,
+                                                            env, on_event=timer.command_events("init"),
+                                                            **phase_options(config_object, "init"))
+        if not installed:
+            logger.error("Init phase of %s failed", workspace)
+            return None
+        return env
+
+    def create_timer(self, path_function: str, cluster_name: str, operation: str) -> DeploymentTimer:
+        return DeploymentTimer(self.provider, cluster_name, function_name(path_function), operation)
+
+    def finish_timer(self, timer: DeploymentTimer, result: str) -> str:
+        self.timings.extend(timer.finish(result))
+        return result
+
+    def render_yaml(self, config_object: object, path_function: str, timer: DeploymentTimer) -> str:
+        """ Renders the serverless.yml of the function source with the configuration of a cluster
+            Args:
+                config_object:
+                    Object - configuration of the cluster
+                path_function
+                    string - path of source code
+                timer
+                    DeploymentTimer - records the yaml rewrite span
+            Returns:
+                String - content of the rendered serverless.yml
+        """
+        with timer.span("render_yaml"):
+            yaml_data = None
+            with open(path_function + 'serverless.yml', 'r') as stream:
+                try:
+                    yaml_data = yaml.safe_load(stream)
+
+                except yaml.YAMLError as exc:
+                    print(exc)
+
+            return render_serverless_yaml(self.update_serverless_yaml(yaml_data, config_object))
+
+    def stage(self, path_function: str, cluster_name: str, serverless_yaml: str, timer: DeploymentTimer) -> str:
+        """ Creates the isolated workspace of a cluster with its rendered serverless.yml
+            Args:
+                path_function
+                    string - path of source code
+                cluster_name
+                    string - name of the cluster
+                serverless_yaml
+                    string - the rendered serverless.yml, see render_yaml
+                timer
+                    DeploymentTimer - records the workspace span
+            Returns:
+                String - path of the workspace
+        """
+        with timer.span("workspace"):
+            # node_modules of functions with a package.json is restored from the dependency cache
+            exclude = ('node_modules',) if os.path.isfile(path_function + 'package.json') else ()
+            workspace = prepare_workspace(path_function, self.provider, cluster_name, exclude)
+            write_rendered_file(workspace, 'serverless.yml', serverless_yaml)
+        return workspace
+
+    async def package_stage(self, commands: list, path_function: str, workspace: str, env: dict,
+                            dependency_key: str = None, **options) -> list:
+        """ Packages the workspace once per function, provider, runtime and configuration and rewrites the
+        serverless deploy commands to deploy that artifact.
+            Args:
+                commands:
+                    list - commands of the post_init phase
+                path_function
+                    string - path of source code
+                workspace
+                    string - path of the workspace with installed dependencies
+                env
+                    dict - environment of the serverless processes
+                dependency_key
+                    string, optional - key of the installed node_modules, see DependencyCache.cache_key
+                options
+                    keyword arguments of run_phase, e.g. timeouts
+            Returns:
+                list - the commands to run
+        """
+        if not ArtifactCache.uses_deploy(commands):
+            return commands
+
+        artifact = await self.artifact_cache.package(path_function, workspace, self.provider, env, dependency_key,
+                                                     **options)
+        if artifact is None:
+            logger.warning("Packaging %s failed, deploying without a prebuilt artifact", workspace)
+            return commands
+
+        return ArtifactCache.deploy_from_artifact(commands, artifact)
+
+    def record_endpoints(self, workspace: str, name: str, urls: list) -> None:
+        """ Stores the endpoints captured from the deploy output of a workspace in the endpoint registry
+            Args:
+                workspace:
+                    String - path of the workspace with the rendered serverless.yml
+                name:
+                    String - the function on the cluster, see deployment_name
+                urls:
+                    list - endpoints printed by serverless deploy
+        """
+        if not urls:
+            return
+        with open(os.path.join(workspace, 'serverless.yml'), 'r') as stream:
+            yaml_data = yaml.safe_load(stream)
+        self.endpoint_registry.record(self.provider, name, endpoints_by_function(yaml_data, urls))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+import asyncio
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+last_used_marker = ".last_used"
+
+
+class CacheStore:
+    """ Content-addressed store of directories on disk, the base of the dependency and the artifact cache
+    An entry is built in a staging directory and renamed into place once it is complete, so concurrent processes
+    never see half written entries. Entries which were not used for the longest time are evicted once the store
+    grows over max_size_bytes.
+
+    """
+    # name of the entries in the log messages
+    entry_kind = "cache"
+
+    def __init__(self, root: str, max_size_bytes: int = 5 * 1024 ** 3):
+        """
+        Args:
+            root:
+                String - directory of the store
+            max_size_bytes:
+                Integer - size of all entries on disk, after which least recently used entries are evicted
+        """
+        self.root = root
+        self.max_size_bytes = max_size_bytes
+        self.locks = {}
+        self.used_keys = set()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def staging_path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".tmp-" + str(os.getpid()))
+
+    def is_complete(self, key: str) -> bool:
+        return os.path.isfile(os.path.join(self.entry_path(key), last_used_marker))
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """ Returns the lock of an entry and marks it as used in this run, so it is never evicted """
+        os.makedirs(self.root, exist_ok=True)
+        self.used_keys.add(key)
+        return self.locks.setdefault(key, asyncio.Lock())
+
+    def touch(self, key: str) -> None:
+        os.utime(os.path.join(self.entry_path(key), last_used_marker))
+
+    async def commit(self, staging: str, key: str) -> bool:
+        """ Moves a finished staging directory into the store """
+        # the marker records the size of the entry, so eviction does not need to walk every entry
+        size = await asyncio.get_running_loop().run_in_executor(None, self.get_size, staging)
+        with open(os.path.join(staging, last_used_marker), 'w') as f:
+            f.write(str(size))
+        try:
+            os.rename(staging, self.entry_path(key))
+        except OSError:
+            # another process finished the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        return self.is_complete(key)
+
+    @staticmethod
+    def get_size(path: str) -> int:
+        size = 0
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                try:
+                    size += os.lstat(os.path.join(root, file)).st_size
+                except OSError:
+                    pass
+        return size
+
+    def evict(self) -> None:
+        """ Removes least recently used entries until the store fits into max_size_bytes.
+        Entries used in this run are never evicted.
+        """
+        entries = []
+        for key in os.listdir(self.root):
+            if not self.is_complete(key):
+                continue
+            marker = os.path.join(self.entry_path(key), last_used_marker)
+            with open(marker, 'r') as f:
+                size = int(f.read() or 0)
+            entries.append((os.stat(marker).st_mtime, key, size))
+
+        total_size = sum(size for _, _, size in entries)
+        for last_used, key, size in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            if key in self.used_keys:
+                continue
+            logger.info("Evicting %s entry %s, last used %s", self.entry_kind, key, time.ctime(last_used))
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            total_size -= size
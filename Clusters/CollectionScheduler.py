@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import asyncio
+import logging
+import random
+import time
+
+from LogPipeline import log_context
+
+logger = logging.getLogger(__name__)
+
+# seconds between two collections of a cluster
+default_interval = 60
+# a cycle starts up to this many seconds after its boundary, so the clusters do not query the providers at once
+default_jitter = 5.0
+
+
+def next_boundary(now: float, interval: int) -> float:
+    """ Returns the next multiple of the interval after now, e.g. the next full minute for 60 seconds """
+    return (int(now) // interval + 1) * interval
+
+
+class CollectionScheduler:
+    """ Runs the collection cycles of every cluster on its own cadence until it is stopped
+    A cycle starts at the next wall clock boundary of the interval of its cluster plus a random jitter. A cycle
+    which takes longer than its interval is not queued up, the boundaries it overran are skipped and the next
+    cycle starts at the following boundary, the watermarks make it collect the skipped range too.
+
+    """
+
+    def __init__(self, jitter: float = default_jitter, on_cycle=None):
+        """
+        Args:
+            jitter:
+                Float, optional - maximum seconds a cycle starts after its boundary
+            on_cycle:
+                Callable, optional - called with the record of every finished cycle: provider, cluster_name,
+                timestamp, duration, skipped, result and the fields returned by the cycle
+        """
+        self.jitter = max(0.0, jitter)
+        self.on_cycle = on_cycle
+        self.stopping = asyncio.Event()
+        self.cycles = {}
+
+    def stop(self) -> None:
+        """ Lets the running cycles finish and starts no new ones """
+        if not self.stopping.is_set():
+            logger.info("Stopping the collection after the running cycles")
+            self.stopping.set()
+
+    async def sleep_until(self, timestamp: float) -> bool:
+        """ Waits until a wall clock time, returns False if the scheduler was stopped in the meantime """
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=max(0.0, timestamp - time.time()))
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def run_cluster(self, provider: str, cluster_name: str, interval: int, cycle) -> None:
+        """ Runs the cycles of one cluster until the scheduler is stopped
+            Args:
+                provider:
+                    String - provider name, e.g. aws
+                cluster_name:
+                    String - name of the cluster
+                interval:
+                    Integer - seconds between two cycles
+                cycle:
+                    Callable - returns the coroutine of one cycle, its result is a dict of fields for the record,
+                    a cycle fails if it raises or returns result "failed"
+        """
+        with log_context(provider=provider, cluster_name=cluster_name):
+            boundary = next_boundary(time.time(), interval)
+            while await self.sleep_until(boundary + random.uniform(0, self.jitter)):
+                started = time.time()
+                record = {"provider": provider, "cluster_name": cluster_name, "timestamp": int(boundary)}
+                try:
+                    # a cycle may report its own result, e.g. failed if it caught the error of a window
+                    record["result"] = "ok"
+                    record.update(await cycle() or {})
+                except Exception:
+                    logger.exception("Collection cycle of %s/%s failed", provider, cluster_name)
+                    record["result"] = "failed"
+                finished = time.time()
+                record["duration"] = finished - started
+
+                # boundaries which passed while the cycle was running are skipped, not queued
+                following = next_boundary(finished, interval)
+                record["skipped"] = int((following - boundary) // interval) - 1
+                if record["skipped"]:
+                    logger.warning("Collection cycle took %.1f s, skipping %d cycles", record["duration"],
+                                   record["skipped"])
+                boundary = following
+
+                self.cycles[(provider, cluster_name)] = record
+                if self.on_cycle is not None:
+                    try:
+                        self.on_cycle(record)
+                    except Exception:
+                        logger.exception("Recording the collection cycle failed")
+
+    async def run_forever(self, jobs: list) -> None:
+        """ Runs the cycles of all clusters until stop is called
+            Args:
+                jobs:
+                    list - list of (provider, cluster_name, interval, cycle) tuples, see run_cluster
+        """
+        await asyncio.gather(*[self.run_cluster(provider, cluster_name, interval, cycle)
+                               for provider, cluster_name, interval, cycle in jobs])
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import yaml
+
+from .CacheStore import CacheStore, last_used_marker
+from .PhaseRunner import run_phase
+from .Workspace import link_tree
+
+logger = logging.getLogger(__name__)
+
+cache_root = os.path.join(".cache", "node_modules")
+# files which decide the content of node_modules
+dependency_files = ("package.json", "package-lock.json", "npm-shrinkwrap.json", ".npmrc")
+
+
+class DependencyCache(CacheStore):
+    """ Content-addressed cache of node_modules directories
+    Entries are keyed by the hash of package.json/package-lock.json and the runtime of the function. The init
+    phase runs at most once per key, every workspace then gets node_modules hardlinked from the cache entry.
+    Entries which were not used for the longest time are evicted once the cache grows over max_size_bytes.
+
+    """
+    entry_kind = "node_modules cache"
+
+    def __init__(self, root: str = cache_root, max_size_bytes: int = 5 * 1024 ** 3):
+        """
+        Args:
+            root:
+                String - directory of the cache
+            max_size_bytes:
+                Integer - size of all entries on disk, after which least recently used entries are evicted
+        """
+        super().__init__(root, max_size_bytes)
+
+    @staticmethod
+    def get_runtime(workspace: str) -> str:
+        """ Reads the runtime from the rendered serverless.yml of a workspace """
+        try:
+            with open(os.path.join(workspace, 'serverless.yml'), 'r') as stream:
+                yaml_data = yaml.safe_load(stream)
+            return str(yaml_data.get('provider', {}).get('runtime', ''))
+        except (OSError, yaml.YAMLError, AttributeError):
+            return ''
+
+    def cache_key(self, workspace: str, init_phase_commands: list) -> str:
+        """ Computes the key of the node_modules of a workspace
+            Args:
+                workspace:
+                    String - path of the workspace
+                init_phase_commands:
+                    list - list of init commands, part of the key as they decide how node_modules is built
+            Returns:
+                String - hex digest, or None if the function has no package.json
+        """
+        if not os.path.isfile(os.path.join(workspace, 'package.json')):
+            return None
+
+        digest = hashlib.sha256()
+        for file_name in dependency_files:
+            file_path = os.path.join(workspace, file_name)
+            if os.path.isfile(file_path):
+                digest.update(file_name.encode())
+                with open(file_path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+        digest.update(self.get_runtime(workspace).encode())
+        digest.update("\n".join(init_phase_commands).encode())
+        return digest.hexdigest()
+
+    async def build(self, key: str, workspace: str, init_phase_commands: list, env: dict, **options) -> bool:
+        """ Runs the init phase in a staging directory which only holds the dependency files and moves the
+        result into the cache.
+        """
+        staging = self.staging_path(key)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for file_name in dependency_files:
+            file_path = os.path.join(workspace, file_name)
+            if os.path.isfile(file_path):
+                shutil.copy2(file_path, staging)
+
+        logger.info("Building node_modules cache entry %s", key)
+        success = await run_phase(init_phase_commands, staging, env, **options)
+        if not success:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+        os.makedirs(os.path.join(staging, 'node_modules'), exist_ok=True)
+        return await self.commit(staging, key)
+
+    async def install(self, init_phase_commands: list, workspace: str, env: dict = None, **options) -> bool:
+        """ Asynchronous function which provides node_modules in a workspace.
+        Functions without package.json just run the init phase in their workspace.
+            Args:
+                init_phase_commands:
+                    list - list of init commands
+                workspace:
+                    String - path of the workspace
+                env:
+                    dict, optional - environment of the init processes
+                options:
+                    keyword arguments of run_phase, e.g. the timeouts of the init phase
+            Returns:
+                Boolean - True if the dependencies are installed
+        """
+        key = self.cache_key(workspace, init_phase_commands)
+        if key is None:
+            return await run_phase(init_phase_commands, workspace, env, **options)
+
+        async with self.lock(key):
+            if self.is_complete(key):
+                logger.debug("node_modules cache hit %s for %s", key, workspace)
+            elif not await self.build(key, workspace, init_phase_commands, env, **options):
+                return False
+            self.touch(key)
+
+        # keep the dependency files of the workspace, only take the ones created by the init phase
+        exclude = (last_used_marker,) + tuple(f for f in dependency_files
+                                              if os.path.exists(os.path.join(workspace, f)))
+        await asyncio.get_running_loop().run_in_executor(None, link_tree, self.entry_path(key), workspace, exclude)
+        self.evict()
+        return True
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+import copy
+import os
+import re
+
+from ConfigLoader import Config, ConfigError
+from .Workspace import function_name
+
+# sub directory of a function per provider, e.g. ./Functions/nodeinfo/gcf/
+provider_function_dirs = {"aws": "aws", "google": "gcf", "openwhisk": "openwhisk"}
+
+
+def normalize_path(path: str) -> str:
+    return path if path.endswith(os.sep) else path + os.sep
+
+
+def cluster_functions(config: Config, provider: str, curr_cluster: dict) -> list:
+    """ Lists the functions to deploy to a cluster
+    These are the `path` of the cluster, the entries of its `functions` list and, as a functions x clusters matrix,
+    every entry of the global `functions` list resolved to the sub directory of the provider.
+        Args:
+            config:
+                Config - the whole configuration
+            provider:
+                String - provider name, e.g. aws
+            curr_cluster:
+                dict - configuration of the cluster
+        Returns:
+            list - (path_function, meta overrides, is the path of the cluster) tuples, without duplicate paths, the
+            meta of a duplicate is merged into the first entry, whose own keys win
+    """
+    entries = []
+    if curr_cluster.get('path'):
+        entries.append((curr_cluster['path'], {}, True))
+    for function in curr_cluster.get('functions') or []:
+        if isinstance(function, dict):
+            entries.append((function['path'], function.get('meta') or {}, False))
+        else:
+            entries.append((function, {}, False))
+    for function in config.functions:
+        if isinstance(function, dict):
+            base_path, meta = function['path'], function.get('meta') or {}
+        else:
+            base_path, meta = function, {}
+        entries.append((os.path.join(base_path, provider_function_dirs[provider]), meta, False))
+
+    functions = []
+    positions = {}
+    for path_function, meta, own in entries:
+        path_function = normalize_path(path_function)
+        if path_function in positions:
+            first_path, first_meta, first_own = functions[positions[path_function]]
+            functions[positions[path_function]] = (first_path, {**meta, **first_meta}, first_own)
+        else:
+            positions[path_function] = len(functions)
+            functions.append((path_function, meta, own))
+    return functions
+
+
+def service_suffix(path_function: str) -> str:
+    """ Returns the function name of a source path as it may appear in a service name """
+    return re.sub(r'[^A-Za-z0-9-]', '-', function_name(path_function))
+
+
+def function_config(curr_cluster: dict, path_function: str, meta: dict, derive_service_name: bool) -> dict:
+    """ Builds the configuration of one function on a cluster.
+    With more than one function on a cluster, each additional function gets its own service, named
+    <service_name>-<function name>, unless the function entry sets its own service_name. The `path` of the cluster
+    keeps the configured service_name.
+    """
+    # a mutable copy, the loaded configuration itself is immutable
+    config_object = copy.deepcopy(curr_cluster)
+    config_object['path'] = path_function
+    config_object['meta'] = dict(curr_cluster.get('meta') or {})
+    config_object['meta'].update(meta)
+    if derive_service_name and 'service_name' not in meta and 'service_name' in config_object['meta']:
+        config_object['meta']['service_name'] = config_object['meta']['service_name'] + "-" + \
+                                                service_suffix(path_function)
+    return config_object
+
+
+def validate_plan(config: Config) -> None:
+    """ Expands the plan of every cluster once, raises ConfigError before anything runs if it is invalid """
+    for provider in provider_function_dirs:
+        expand_plan(config, provider, all_clusters=True)
+
+
+def expand_plan(config: Config, provider: str, providers_list: list = None, all_clusters: bool = False) -> list:
+    """ Expands the selected clusters of a provider into one entry per function and cluster
+        Args:
+            config:
+                Config - the whole configuration
+            provider:
+                String - provider name, e.g. aws
+            providers_list:
+                list, optional - names of the selected clusters
+            all_clusters:
+                bool, optional - select all clusters of the provider
+        Returns:
+            list - (cluster_name, config_object, path_function) tuples
+    """
+    plan = []
+    for cluster_name, curr_cluster in config.select(provider, providers_list, all_clusters):
+        functions = cluster_functions(config, provider, curr_cluster)
+        # the workspace, the deployment state and the endpoints of a function are keyed by its name
+        names = {}
+        for path_function, _, _ in functions:
+            other = names.setdefault(function_name(path_function), path_function)
+            if other != path_function:
+                raise ConfigError("providers." + provider + "." + cluster_name + ": functions " + other + " and " +
+                                  path_function + " have the same name " + function_name(path_function))
+        for path_function, meta, own in functions:
+            plan.append((cluster_name, function_config(curr_cluster, path_function, meta,
+                                                       len(functions) > 1 and not own), path_function))
+    return plan
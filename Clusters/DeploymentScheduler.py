@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import asyncio
+import logging
+
+from LogPipeline import log_context
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentScheduler:
+    """ Bounded-concurrency scheduler for deployment jobs
+    A job only starts once a slot is free in the global limit and in the limit of its provider, so a
+    rollout to many clusters takes about as long as the slowest cluster instead of the sum of all.
+
+    """
+
+    def __init__(self, max_parallel: int = 8, max_parallel_per_provider: dict = None):
+        """
+        Args:
+            max_parallel:
+                Integer - maximum number of jobs running at the same time over all providers
+            max_parallel_per_provider:
+                dict, optional - maximum number of jobs running at the same time per provider name
+        """
+        self.max_parallel = max(1, max_parallel)
+        self.max_parallel_per_provider = max_parallel_per_provider or {}
+        self.global_semaphore = asyncio.Semaphore(self.max_parallel)
+        self.provider_semaphores = {}
+
+    def get_provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self.provider_semaphores:
+            limit = self.max_parallel_per_provider.get(provider, self.max_parallel)
+            self.provider_semaphores[provider] = asyncio.Semaphore(max(1, int(limit)))
+        return self.provider_semaphores[provider]
+
+    async def run(self, provider: str, cluster_name: str, function: str, job):
+        """ Runs a single job once a slot is available.
+        Args:
+            provider:
+                String - provider name, e.g. aws
+            cluster_name:
+                String - name of the cluster the job belongs to
+            function:
+                String - name of the function the job deploys or removes
+            job:
+                Coroutine - the deploy/delete coroutine to run
+        Returns:
+            The result of the job, or the raised exception
+        """
+        async with self.get_provider_semaphore(provider):
+            async with self.global_semaphore:
+                with log_context(provider=provider, cluster_name=cluster_name, function=function):
+                    logger.info("Starting job for %s/%s/%s", provider, cluster_name, function)
+                    try:
+                        result = await job
+                    except Exception as e:
+                        logger.exception("Job for %s/%s/%s failed", provider, cluster_name, function)
+                        return e
+                    logger.info("Finished job for %s/%s/%s: %s", provider, cluster_name, function, result)
+                    return result
+
+    async def run_all(self, jobs: list) -> list:
+        """ Fans out all jobs and waits until every one of them is finished.
+        Args:
+            jobs:
+                list - list of (provider, cluster_name, function, coroutine) tuples
+        Returns:
+            list - results of the jobs in the order they were given
+        """
+        return await asyncio.gather(*[self.run(provider, cluster_name, function, job)
+                                      for provider, cluster_name, function, job in jobs])
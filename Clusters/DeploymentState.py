@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+state_file = os.path.join(".deploy-state", "state.json")
+# entries of the source tree which do not change what is deployed
+ignored_entries = ("node_modules", ".serverless", "serverless.yml", "config.json")
+
+
+class DeploymentState:
+    """ Local store of the last successful deployment of each function on each cluster
+    A deployment is identified by a digest of the function source, the rendered serverless.yml, the provider
+    target and the phases, so unchanged clusters can be skipped on the next deploy.
+
+    """
+
+    def __init__(self, path: str = state_file):
+        """
+        Args:
+            path:
+                String - the json file which holds the state
+        """
+        self.path = path
+        self.state = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r') as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError) as exc:
+                logger.warning("Ignoring unreadable deployment state %s: %s", path, exc)
+
+    @staticmethod
+    def source_digest(path_function: str) -> str:
+        """ Computes a digest over the relative paths and the content of the function source """
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path_function):
+            relative_root = os.path.relpath(root, path_function)
+            if relative_root == os.curdir:
+                dirs[:] = [d for d in dirs if d not in ignored_entries]
+                files = [f for f in files if f not in ignored_entries]
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                digest.update(os.path.normpath(os.path.join(relative_root, file)).encode())
+                with open(file_path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def digest(self, path_function: str, serverless_yaml: str, provider: str, target: object,
+               phases: object = None) -> str:
+        """ Computes the digest of a deployment, before its workspace is staged
+            Args:
+                path_function:
+                    String - path of source code
+                serverless_yaml:
+                    String - the rendered serverless.yml of the cluster
+                provider:
+                    String - provider name, e.g. aws
+                target:
+                    Object - the auth section of the cluster, identifies the account/host deployed to
+                phases:
+                    Object, optional - the phases section of the cluster, its commands and timeouts
+            Returns:
+                String - hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(provider.encode())
+        digest.update(self.source_digest(path_function).encode())
+        digest.update(serverless_yaml.encode())
+        digest.update(json.dumps(target, sort_keys=True, default=str).encode())
+        digest.update(json.dumps(phases, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def is_up_to_date(self, provider: str, name: str, digest: str) -> bool:
+        entry = self.state.get(provider, {}).get(name)
+        return entry is not None and entry['digest'] == digest
+
+    def record(self, provider: str, name: str, digest: str) -> None:
+        """ Stores a successful deployment, name identifies the function on the cluster, see deployment_name """
+        self.state.setdefault(provider, {})[name] = {"digest": digest, "deployed_at": int(time.time())}
+        self.save()
+
+    def forget(self, provider: str, name: str) -> None:
+        """ Drops a deployment, e.g. after it was removed """
+        if self.state.get(provider, {}).pop(name, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.path)
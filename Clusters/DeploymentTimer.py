@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentTimer:
+    """ Collects timing spans of one deployment or removal
+    Phase spans are recorded with the span context manager, command spans from the command_end events of the
+    phase runner. The records are written as the 'deployment' measurement by the InfluxDBWriter.
+
+    """
+
+    def __init__(self, provider: str, cluster_name: str, function: str, operation: str):
+        """
+        Args:
+            provider:
+                String - provider name, e.g. aws
+            cluster_name:
+                String - name of the cluster
+            function:
+                String - name of the function
+            operation:
+                String - deploy or delete
+        """
+        self.tags = {"provider": provider, "cluster_name": cluster_name, "function": function,
+                     "operation": operation}
+        self.start = time.time()
+        self.records = []
+
+    def add(self, phase: str, start: float, duration: float, command: str = "", exit_code: int = 0) -> None:
+        record = dict(self.tags)
+        record.update({"timestamp": start, "phase": phase, "command": command, "duration": duration,
+                       "exit_code": exit_code})
+        self.records.append(record)
+        logger.debug("%s/%s %s %s took %.3fs", self.tags["provider"], self.tags["cluster_name"], phase, command,
+                     duration)
+
+    @contextmanager
+    def span(self, phase: str):
+        """ Times the code of a phase, e.g. `with timer.span("authentication"): ...` """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(phase, start, time.time() - start)
+
+    def command_events(self, phase: str):
+        """ Returns an on_event callback for the phase runner which records every command of a phase """
+        def on_event(event: dict) -> None:
+            if event["event"] == "command_end":
+                # the artifact path of package/deploy commands would make every command a new tag value
+                command = event["command"].split(" --package ")[0]
+                self.add(phase, time.time() - event["duration"], event["duration"], command, event["exit_code"])
+        return on_event
+
+    def finish(self, result: str) -> list:
+        """ Records the total span of the deployment and tags all records with the result, e.g. Deployed """
+        self.add("total", self.start, time.time() - self.start)
+        for record in self.records:
+            record["result"] = result
+        return self.records
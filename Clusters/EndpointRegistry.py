@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+registry_file = os.path.join(".deploy-state", "endpoints.json")
+# e.g. "  GET - https://abc.execute-api.us-east-1.amazonaws.com/dev/nodeinfo" of serverless deploy
+endpoint_pattern = re.compile(r'\b(?:GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS|ANY)\s+-\s+(https?://\S+)')
+
+
+class EndpointCapture:
+    """ on_event callback of the phase runner which collects the endpoints printed by serverless deploy
+    Every event is passed on to the wrapped callback, e.g. the one of the DeploymentTimer.
+
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.urls = []
+
+    def __call__(self, event: dict) -> None:
+        if event["event"] == "line":
+            match = endpoint_pattern.search(event["line"])
+            if match and match.group(1) not in self.urls:
+                self.urls.append(match.group(1))
+        if self.on_event is not None:
+            self.on_event(event)
+
+
+def endpoints_by_function(yaml_data: dict, urls: list) -> dict:
+    """ Assigns the captured endpoints to the functions of a serverless.yml
+        Args:
+            yaml_data:
+                dict - the rendered serverless.yml
+            urls:
+                list - endpoints printed by serverless deploy
+        Returns:
+            dict - function name -> endpoint
+    """
+    endpoints = {}
+    for function, function_data in (yaml_data.get('functions') or {}).items():
+        paths = []
+        for event in (function_data or {}).get('events') or []:
+            http = event.get('http') if isinstance(event, dict) else None
+            if isinstance(http, dict) and http.get('path'):
+                paths.append(http['path'].strip('/'))
+        # functions without an http path are reachable under their name
+        paths = paths or [function]
+        for url in urls:
+            if any(url.rstrip('/').endswith('/' + path) for path in paths):
+                endpoints[function] = url
+                break
+    return endpoints
+
+
+class EndpointRegistry:
+    """ Local store of the endpoints of the deployed functions, keyed by provider, cluster/function (see
+    deployment_name) and the function name in serverless.yml
+
+    """
+
+    def __init__(self, path: str = registry_file):
+        """
+        Args:
+            path:
+                String - the json file which holds the endpoints
+        """
+        self.path = path
+        self.endpoints = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r') as f:
+                    self.endpoints = json.load(f)
+            except (OSError, ValueError) as exc:
+                logger.warning("Ignoring unreadable endpoint registry %s: %s", path, exc)
+
+    def get(self, provider: str, name: str, function: str) -> str:
+        """ Returns the endpoint of a function or an empty string if none was captured """
+        return self.endpoints.get(provider, {}).get(name, {}).get(function, "")
+
+    def record(self, provider: str, name: str, endpoints: dict) -> None:
+        """ Stores the endpoints of a deployment, name identifies the function on the cluster """
+        self.endpoints.setdefault(provider, {})[name] = endpoints
+        self.save()
+
+    def forget(self, provider: str, name: str) -> None:
+        """ Drops the endpoints of a deployment, e.g. after it was removed """
+        if self.endpoints.get(provider, {}).pop(name, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.endpoints, f, indent=4)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import pandas as pd
+from pandas import DataFrame
+from pandas.api.types import is_datetime64_any_dtype
+
+
+def snap_timestamps(timestamps: pd.Series, period: int) -> pd.Series:
+    """ Floors timestamps, epoch seconds or datetimes, to multiples of the period """
+    if is_datetime64_any_dtype(timestamps):
+        return timestamps.dt.floor(str(period) + "s")
+    return timestamps - timestamps % period
+
+
+def align_frames(frames: list, period: int = 60, keys: tuple = ("action",), aggregations: dict = None,
+                 fill: dict = None) -> DataFrame:
+    """ Joins the metric frames of a collector on a common time grid in one pass
+    The timestamps of every frame are floored to the grid, points of the same series which fall into the same grid
+    period are aggregated, then all frames are concatenated side by side on a (timestamp, *keys) index. It is an
+    outer join, a point is kept even if other metrics have no value for it.
+    e.g. `frame = align_frames([invocations, durations], 60, fill={"invocations": 0, "memory": "ffill"})`
+        Args:
+            frames:
+                list - DataFrames with the columns 'timestamp', the key columns and value columns, empty frames are
+                skipped
+            period:
+                Integer, optional - seconds of the grid
+            keys:
+                tuple, optional - the columns which identify a series besides the timestamp
+            aggregations:
+                dict, optional - column -> aggregation of the points within one period, e.g. "sum" for counts,
+                "mean" if not set
+            fill:
+                dict, optional - column -> value for the missing points, or "ffill" to repeat the last value of the
+                series, other missing points stay NaN
+        Returns:
+            DataFrame - with the columns 'timestamp', the categorical key columns and the value columns of all frames
+    """
+    aggregations = aggregations or {}
+    index = ["timestamp"] + list(keys)
+    columns = {}
+    for frame in frames:
+        if frame is None or frame.empty:
+            continue
+        frame = frame.assign(timestamp=snap_timestamps(frame["timestamp"], period)).set_index(index)
+        if frame.index.has_duplicates:
+            frame = frame.groupby(level=index, observed=True, sort=False).agg(
+                {column: aggregations.get(column, "mean") for column in frame.columns})
+        for column in frame.columns:
+            columns.setdefault(column, []).append(frame[column])
+
+    if not columns:
+        return DataFrame()
+
+    # a column reported by more than one frame, e.g. memory, takes the first value of each point
+    series = []
+    for column, parts in columns.items():
+        combined = parts[0]
+        for part in parts[1:]:
+            combined = combined.combine_first(part)
+        series.append(combined.rename(column))
+    result = pd.concat(series, axis=1, join="outer").sort_index()
+
+    for column, rule in (fill or {}).items():
+        if column not in result.columns:
+            continue
+        if rule == "ffill":
+            result[column] = result.groupby(level=list(keys), observed=True)[column].ffill()
+        else:
+            result[column] = result[column].fillna(rule)
+
+    result = result.reset_index()
+    for key in keys:
+        result[key] = result[key].astype("category")
+    return result
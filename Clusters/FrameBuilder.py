@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+class FrameBuilder:
+    """ Columnar builder of the DataFrames of the collectors
+    Data points are added in blocks, typically one time series or one page of results, as NumPy arrays instead of a
+    dict per point. Label columns, e.g. action and region, are stored as integer codes, the frame is built once
+    with categorical label columns.
+    e.g.
+        builder = FrameBuilder(("execution_times",), ("action", "region"))
+        builder.add_block(timestamps, {"action": name, "region": region}, {"execution_times": values})
+        frame = builder.build()
+
+    """
+
+    def __init__(self, value_columns: tuple, label_columns: tuple = ("action",), timestamp_dtype=np.int64):
+        """
+        Args:
+            value_columns:
+                tuple - names of the numeric columns, stored as float64
+            label_columns:
+                tuple, optional - names of the categorical columns
+            timestamp_dtype:
+                dtype, optional - dtype of the timestamp column, int64 epoch seconds by default
+        """
+        self.value_columns = tuple(value_columns)
+        self.label_columns = tuple(label_columns)
+        self.timestamp_dtype = timestamp_dtype
+        self.timestamps = []
+        self.values = {column: [] for column in self.value_columns}
+        self.codes = {column: [] for column in self.label_columns}
+        self.categories = {column: {} for column in self.label_columns}
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def encode(self, column: str, label: str) -> int:
+        return self.categories[column].setdefault(label, len(self.categories[column]))
+
+    def add_block(self, timestamps, labels: dict, values: dict) -> None:
+        """ Adds a block of data points
+            Args:
+                timestamps:
+                    array-like - timestamps of the data points
+                labels:
+                    dict - label column -> one label for the whole block or a sequence with a label per point
+                values:
+                    dict - value column -> one value for the whole block or an array-like with a value per point,
+                    missing value columns are NaN
+        """
+        timestamps = np.asarray(timestamps, dtype=self.timestamp_dtype)
+        length = len(timestamps)
+        if not length:
+            return
+
+        self.timestamps.append(timestamps)
+        for column in self.label_columns:
+            label = labels.get(column)
+            if label is None or isinstance(label, str):
+                code = self.encode(column, label) if label is not None else -1
+                self.codes[column].append(np.full(length, code, dtype=np.int32))
+            else:
+                self.codes[column].append(np.fromiter(
+                    (self.encode(column, item) if item is not None else -1 for item in label), dtype=np.int32,
+                    count=length))
+        for column in self.value_columns:
+            value = values.get(column, np.nan)
+            if np.ndim(value) == 0:
+                self.values[column].append(np.full(length, value, dtype=np.float64))
+            else:
+                self.values[column].append(np.asarray(value, dtype=np.float64))
+        self.length += length
+
+    def build(self) -> DataFrame:
+        """ Concatenates the blocks once and returns the frame with the columns timestamp, the label columns and
+        the value columns, an empty frame if no data point was added
+        """
+        if not self.length:
+            return DataFrame()
+
+        columns = {"timestamp": np.concatenate(self.timestamps)}
+        for column in self.label_columns:
+            columns[column] = pd.Categorical.from_codes(np.concatenate(self.codes[column]),
+                                                        categories=list(self.categories[column]))
+        for column in self.value_columns:
+            columns[column] = np.concatenate(self.values[column])
+        return DataFrame(columns)
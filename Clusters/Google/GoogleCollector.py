@@ -3,14 +3,17 @@ import subprocess
 import sys
 import os
 sys.path.append(os.path.abspath('../'))
-from Clusters import BaseCollector
+from Clusters.BaseCollector import BaseCollector
+from Clusters.FrameBuilder import FrameBuilder
+from Clusters.FrameAligner import align_frames
+from LogPipeline import log_frame
 import logging
 import json
 import yaml
 
-logging.basicConfig(filename='Logs/log.log', format='%(message)s', filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+import numpy as np
 from pandas import DataFrame
 import pandas as pd
 import google.cloud
@@ -24,16 +27,106 @@ import os
 import time
 
 
+# alignment period in seconds of the collected series, one point per function and minute
+default_resolution = 60
+# metric -> server side aggregation, every series is aligned to the resolution with the per series aligner and
+# the series of a group, e.g. the ok/error status of execution_times, are combined with the cross series reducer
+metric_aggregations = {
+    'execution_times': {
+        'per_series_aligner': 'ALIGN_DELTA',
+        'cross_series_reducer': 'REDUCE_SUM',
+        'group_by_fields': ('resource.labels.function_name', 'resource.labels.region', 'metric.labels.memory'),
+    },
+    'user_memory_bytes': {
+        'per_series_aligner': 'ALIGN_DELTA',
+        'cross_series_reducer': 'REDUCE_SUM',
+        'group_by_fields': ('resource.labels.function_name', 'resource.labels.region'),
+    },
+    'network_egress': {
+        'per_series_aligner': 'ALIGN_DELTA',
+        'cross_series_reducer': 'REDUCE_SUM',
+        'group_by_fields': ('resource.labels.function_name', 'resource.labels.region'),
+    },
+    'active_instances': {
+        'per_series_aligner': 'ALIGN_MEAN',
+        'cross_series_reducer': 'REDUCE_SUM',
+        'group_by_fields': ('resource.labels.function_name', 'resource.labels.region'),
+    },
+}
+# value type of a series -> field of its points
+point_value_fields = {'INT64': 'int64_value', 'DOUBLE': 'double_value', 'DISTRIBUTION': 'distribution_value'}
+# metric -> divisor of its values, execution times are reported in ns and memory in bytes
+metric_scales = {'execution_times': 10**9, 'user_memory_bytes': 1024*1024}
+# how the metrics are joined on the grid of the collection, counts are summed and are 0 if missing
+frame_aggregations = {'invocations': 'sum', 'network_egress': 'sum'}
+frame_fill = {'invocations': 0, 'network_egress': 0, 'memory': 'ffill'}
+
+
 class GCFCollector(BaseCollector):
 
+    def __init__(self, aggregations: dict = None):
+        """
+        Args:
+            aggregations:
+                dict, optional - metric -> aggregation fields (per_series_aligner, cross_series_reducer,
+                group_by_fields) which override the defaults in metric_aggregations
+        """
+        # one monitoring client per service account, reused by all metrics and collection cycles
+        self.clients = {}
+        self.aggregations = {metric: dict(aggregation) for metric, aggregation in metric_aggregations.items()}
+        for metric, aggregation in (aggregations or {}).items():
+            self.aggregations.setdefault(metric, {}).update(aggregation)
+
     def init(self, prometheus_url: str, kubernetes_prom_url):
         pass
 
-
-
-    @staticmethod
-    async def get_and_convert_data_frame(config_object: object, start: int, end: int,
-                                   feature_col_name: str) -> DataFrame:
+    def get_client(self, config_object: object):
+        """ Returns the cached monitoring client of a cluster, its credentials are built from the auth section
+        in memory, so the gRPC channel and the access token are reused
+            Args:
+                config_object:
+                    config_object - the service account info of the cluster
+            Returns:
+                MetricServiceAsyncClient - the client
+        """
+        key = (config_object.get('project_id'), config_object.get('client_email'),
+               config_object.get('private_key_id'))
+        if key not in self.clients:
+            credentials = service_account.Credentials.from_service_account_info(dict(config_object))
+            self.clients[key] = monitoring_v3.services.metric_service.MetricServiceAsyncClient(credentials=credentials)
+        return self.clients[key]
+
+    async def close(self) -> None:
+        """ Closes the gRPC channels of all cached clients """
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            try:
+                await client.transport.close()
+            except Exception:
+                logger.exception("Closing the monitoring client failed")
+
+    def get_aggregation(self, feature_col_name: str, alignment_period: int):
+        """ Builds the aggregation of a metric
+            Args:
+                feature_col_name:
+                    String - name of the metric
+                alignment_period:
+                    Integer - seconds per point
+            Returns:
+                Aggregation - the aggregation of the list_time_series request
+        """
+        aggregation = self.aggregations.get(feature_col_name, {})
+        return monitoring_v3.Aggregation({
+            "alignment_period": {"seconds": alignment_period},
+            "per_series_aligner": getattr(monitoring_v3.Aggregation.Aligner,
+                                          aggregation.get('per_series_aligner', 'ALIGN_NONE')),
+            "cross_series_reducer": getattr(monitoring_v3.Aggregation.Reducer,
+                                            aggregation.get('cross_series_reducer', 'REDUCE_NONE')),
+            "group_by_fields": list(aggregation.get('group_by_fields', ())),
+        })
+
+    async def get_and_convert_data_frame(self, config_object: object, start: int, end: int,
+                                         feature_col_name: str, resolution: int = default_resolution) -> DataFrame:
         """ Get and Convert the timeseries data values to a dataframe .
         Args:
             config_object:
@@ -44,16 +137,14 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should end
            feature_col_name:
                String - name of the feature column name
+           resolution:
+               Integer, optional - alignment period in seconds, the series are aggregated by Cloud Monitoring,
+               None returns the raw points
         Returns:
            DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
            'feature_col_name'
         """
-        # Step 1: Export authorization
-        with open("./Clusters/Google/" + 'config.json', 'w') as f:
-            json.dump(config_object, f, indent=2)
-
-        credentials = service_account.Credentials.from_service_account_file("./Clusters/Google/" + 'config.json')
-        client = monitoring_v3.services.metric_service.MetricServiceAsyncClient(credentials=credentials)
+        client = self.get_client(config_object)
         interval = monitoring_v3.TimeInterval(
             {
                 "end_time": {"seconds": end, "nanos": 0},
@@ -61,52 +152,63 @@ class GCFCollector(BaseCollector):
             }
         )
 
-        ts_results = await client.list_time_series(
-            request={
-                "name": f"projects/{config_object['project_id']}",
-                "filter": 'metric.type = "cloudfunctions.googleapis.com/function/' + feature_col_name + '"',
-                "interval": interval,
-                "view": "FULL",
-                # "aggregation": aggregation,
-            }
-        )
-        values = []
-        async for ts in ts_results:
-            name = ts.resource.labels['function_name']
-            region = ts.resource.labels['region']
-
-            if feature_col_name == 'execution_times':
-                memory = ts.metric.labels['memory']
-                for p in ts.points:
-                    t = int(p.interval.start_time.timestamp())
-                    execution_time = p.value.distribution_value.mean / 10**9
-                    invocations = p.value.distribution_value.count
-                    dic = {'timestamp': t, 'action': name, 'region': region, 'memory': float(memory),
-                           feature_col_name: float(execution_time), 'invocations': float(invocations)}
-                    values.append(dic)
-            elif feature_col_name == 'user_memory_bytes':
-                for p in ts.points:
-                    t = int(p.interval.start_time.timestamp())
-                    mem_usage = p.value.distribution_value.mean/(1024*1024)
-                    dic = {'timestamp': t, 'action': name, 'region': region,
-                           "mem_usage_mb": float(mem_usage)}
-                    values.append(dic)
-            elif feature_col_name == 'active_instances':
-                for p in ts.points:
-                    t = int(p.interval.start_time.timestamp()) - 60
-                    v = p.value.int64_value
-                    dic = {'timestamp': t, 'action': name, 'region': region, feature_col_name: float(v)}
-                    values.append(dic)
-            else:
-                for p in ts.points:
-                    t = int(p.interval.start_time.timestamp())
-                    v = p.value.int64_value
-                    dic = {'timestamp': t, 'action': name, 'region': region, feature_col_name: float(v)}
-                    values.append(dic)
-
-        return DataFrame(values)
-
-    async def collect_active_instances(self, config_object: object, start: int, end: int) -> DataFrame:
+        request = {
+            "name": f"projects/{config_object['project_id']}",
+            "filter": 'metric.type = "cloudfunctions.googleapis.com/function/' + feature_col_name + '"',
+            "interval": interval,
+            "view": "FULL",
+        }
+        if resolution:
+            request["aggregation"] = self.get_aggregation(feature_col_name, resolution)
+        ts_results = await client.list_time_series(request=request)
+        if feature_col_name == 'execution_times':
+            value_columns = ('memory', feature_col_name, 'invocations')
+        elif feature_col_name == 'user_memory_bytes':
+            value_columns = ('mem_usage_mb',)
+        else:
+            value_columns = (feature_col_name,)
+        builder = FrameBuilder(value_columns, ('action', 'region'))
+
+        scale = metric_scales.get(feature_col_name, 1)
+        # one page of time series at a time, only the converted arrays are kept
+        async for page in ts_results.pages:
+            for ts in page.time_series:
+                labels = {'action': ts.resource.labels['function_name'], 'region': ts.resource.labels['region']}
+                points = ts.points
+                count = len(points)
+                if resolution:
+                    # an aligned point covers the period before its end time
+                    timestamps = np.fromiter((int(p.interval.end_time.timestamp()) for p in points),
+                                             dtype=np.int64, count=count) - resolution
+                else:
+                    timestamps = np.fromiter((int(p.interval.start_time.timestamp()) for p in points),
+                                             dtype=np.int64, count=count)
+
+                field = point_value_fields.get(ts.value_type.name, 'int64_value')
+                if field == 'distribution_value':
+                    values = np.fromiter((p.value.distribution_value.mean for p in points), dtype=np.float64,
+                                         count=count) / scale
+                    counts = np.fromiter((p.value.distribution_value.count for p in points), dtype=np.float64,
+                                         count=count)
+                else:
+                    # e.g. a percentile aligner reduces a distribution to a double
+                    values = np.fromiter((getattr(p.value, field) for p in points), dtype=np.float64,
+                                         count=count) / scale
+                    counts = np.nan
+
+                if feature_col_name == 'execution_times':
+                    builder.add_block(timestamps, labels, {
+                        'memory': float(ts.metric.labels['memory']), feature_col_name: values,
+                        'invocations': counts})
+                elif feature_col_name == 'user_memory_bytes':
+                    builder.add_block(timestamps, labels, {'mem_usage_mb': values})
+                else:
+                    builder.add_block(timestamps, labels, {feature_col_name: values})
+
+        return builder.build()
+
+    async def collect_active_instances(self, config_object: object, start: int, end: int,
+                                       resolution: int = default_resolution) -> DataFrame:
         """ Collects the number of active instances for GCF Function.
         Args:
             config_object:
@@ -115,16 +217,20 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - alignment period in seconds, None for the raw points
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
             'active_instances'
         """
 
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'active_instances')
+        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'active_instances',
+                                                           resolution)
 
         return result_df
 
-    async def collect_network_egress(self, config_object: object, start: int, end: int) -> DataFrame:
+    async def collect_network_egress(self, config_object: object, start: int, end: int,
+                                     resolution: int = default_resolution) -> DataFrame:
         """ Collects the network egress usage from GCF Function.
         Args:
             target:
@@ -133,16 +239,20 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - alignment period in seconds, None for the raw points
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
             'network_egress'
         """
 
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'network_egress')
+        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'network_egress',
+                                                           resolution)
 
         return result_df
 
-    async def collect_execution_times(self, config_object: object, start: int, end: int) -> DataFrame:
+    async def collect_execution_times(self, config_object: object, start: int, end: int,
+                                      resolution: int = default_resolution) -> DataFrame:
         """ Collects the execution times of GCF Functions.
         Args:
             target:
@@ -151,16 +261,20 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - alignment period in seconds, None for the raw points
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
             'execution_times'
         """
 
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'execution_times')
+        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'execution_times',
+                                                           resolution)
 
         return result_df
 
-    async def collect_user_memory_bytes(self, config_object: object, start: int, end: int) -> DataFrame:
+    async def collect_user_memory_bytes(self, config_object: object, start: int, end: int,
+                                        resolution: int = default_resolution) -> DataFrame:
         """ Collects the memory usage from GCF Function.
         Args:
             target:
@@ -169,12 +283,15 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - alignment period in seconds, None for the raw points
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'action', 'region', 'memory',
             'user_memory_bytes'
         """
 
-        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'user_memory_bytes')
+        result_df = await self.get_and_convert_data_frame(config_object, start, end, 'user_memory_bytes',
+                                                           resolution)
 
         return result_df
 
@@ -208,7 +325,8 @@ class GCFCollector(BaseCollector):
 
         return frame
 
-    async def collect(self, config_object: object, cluster_name: str, start: int, end: int) -> DataFrame:
+    async def collect(self, config_object: object, cluster_name: str, start: int, end: int,
+                      resolution=default_resolution) -> DataFrame:
         """ Collects function active_instances, network_egress, and execution_times for a GoogleCloudTarget.
         Args:
             config_object:
@@ -219,37 +337,43 @@ class GCFCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer or dict, optional - alignment period in seconds of all metrics, or metric -> alignment
+                period, e.g. 300 or 3600 keeps multi-day queries small, None returns the raw points
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'target', 'action' and measurement fields(s)
         """
+        if isinstance(resolution, dict):
+            resolutions = resolution
+        else:
+            resolutions = dict.fromkeys(metric_aggregations, resolution)
 
-        print('innnn')
         # start each worker
         tasks: List[asyncio.Task] = [
-            asyncio.create_task(self.collect_network_egress(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_execution_times(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_user_memory_bytes(config_object["auth"], start, end)),
-            asyncio.create_task(self.collect_active_instances(config_object["auth"], start, end))
+            asyncio.create_task(self.collect_network_egress(
+                config_object["auth"], start, end, resolutions.get('network_egress', default_resolution))),
+            asyncio.create_task(self.collect_execution_times(
+                config_object["auth"], start, end, resolutions.get('execution_times', default_resolution))),
+            asyncio.create_task(self.collect_user_memory_bytes(
+                config_object["auth"], start, end, resolutions.get('user_memory_bytes', default_resolution))),
+            asyncio.create_task(self.collect_active_instances(
+                config_object["auth"], start, end, resolutions.get('active_instances', default_resolution)))
         ]
 
-        # wait for all workers
-        combined_frame = DataFrame()
+        # wait for all workers, a failed metric fails the window
+        frames = []
         try:
             # wait for max 45 seconds
             for result in asyncio.as_completed(tasks, timeout=45.0):
                 frame = await result
-
-                if combined_frame.empty:
-                    combined_frame = frame
-                else:
-                    #frame = frame[frame["action"] == "mytestservicegcf1-dev-nodeinfo"]
-                    print(frame)
-                    combined_frame = pd.merge(combined_frame, frame, on=['timestamp', 'action', 'region'])
-
-        except Exception as e:
-            print("Exception when tyring to query data")
-            print(e)
-            traceback.print_exc()
-
+                log_frame(logger, frame, "gcf frame")
+                frames.append(frame)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # metrics with different resolutions are joined on the coarsest grid
+        period = max(resolutions.get(metric) or default_resolution for metric in metric_aggregations)
+        combined_frame = align_frames(frames, period, ('action', 'region'), frame_aggregations, frame_fill)
 
         return self.do_frame_postprocessing(combined_frame, cluster_name, "function_usage")
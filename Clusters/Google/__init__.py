@@ -1,2 +1,10 @@
-from .GoogleDeploy import GoogleDeployment
-from .GoogleCollector import GCFCollector
\ No newline at end of file
+from Clusters.ProviderRegistry import lazy_attribute
+
+_lazy_exports = {
+    "GoogleDeployment": ".GoogleDeploy",
+    "GCFCollector": ".GoogleCollector",
+}
+
+
+def __getattr__(name):
+    return lazy_attribute(__name__, _lazy_exports, name)
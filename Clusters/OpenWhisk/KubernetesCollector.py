@@ -2,37 +2,35 @@
 import subprocess
 import sys
 import os
-from Clusters import BaseCollector
+from Clusters.BaseCollector import BaseCollector
 import logging
 import json
 import yaml
 
-logging.basicConfig(filename='Logs/log.log', format='%(message)s', filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from pandas import DataFrame
 import pandas as pd
-import google.cloud
-from google.cloud import monitoring_v3
-from google.oauth2 import service_account
 from typing import List, Tuple
 
 import traceback
 import asyncio
 import os
 import time
-import asyncio
-import aiohttp
-from aiohttp_requests import requests
 from abc import abstractmethod
 import re
 from .PrometheusCollector import PrometheusCollector
+from .PrometheusSessionPool import PrometheusSessionPool
+from LogPipeline import log_frame
 
 
 class KubernetesCollector(BaseCollector):
 
-    def __init__(self, prometheus_url: str):
-        self.prom_obj = PrometheusCollector(prometheus_url)
+    def __init__(self, prometheus_url: str, session_pool: PrometheusSessionPool = None):
+        self.prom_obj = PrometheusCollector(prometheus_url, session_pool)
+
+    async def close(self) -> None:
+        await self.prom_obj.close()
 
     async def collect_replicas(self, start: int, end: int) -> DataFrame:
         """ Collects the amount of active replicas per function.
@@ -49,7 +47,7 @@ class KubernetesCollector(BaseCollector):
 
         # map over every "action" -> remove *-guest-
         frame.drop(['action'], axis=1, inplace=True)
-        print(frame)
+        log_frame(logger, frame, "kubernetes replicas")
         #frame["action"] = frame["action"].map(lambda e: re.sub(r'^.*?-user-events-', '', e))
 
         frame = frame.groupby(["kubernetes_pod_name", "timestamp"]).sum()
@@ -3,21 +3,19 @@ import subprocess
 import sys
 import os
 sys.path.append(os.path.abspath('../'))
-from Clusters import BaseCollector
-from .PrometheusCollector import PrometheusCollector
+from Clusters.BaseCollector import BaseCollector
+from .PrometheusCollector import PrometheusCollector, get_step
 from .KubernetesCollector import KubernetesCollector
+from .PrometheusSessionPool import PrometheusSessionPool
+from Clusters.FrameAligner import align_frames
 import logging
 import json
 import yaml
 
-logging.basicConfig(filename='Logs/log.log', format='%(message)s', filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from pandas import DataFrame
 import pandas as pd
-import google.cloud
-from google.cloud import monitoring_v3
-from google.oauth2 import service_account
 from typing import List, Tuple
 
 import traceback
@@ -25,17 +23,25 @@ import asyncio
 import os
 import time
 
+# how the metrics are joined on the grid of the step, the increases are summed, counts are 0 if missing
+frame_aggregations = {"cold_starts": "sum", "invocations": "sum", "execution_times": "sum", "init_time": "sum"}
+frame_fill = {"cold_starts": 0, "invocations": 0, "memory": "ffill"}
+
 
 class OpenWhiskCollector(BaseCollector):
     def __init__(self, prometheus_url: str = None, kubernetes_prom_url: str = None):
-        self.prom_obj = PrometheusCollector(prometheus_url)
-        self.kube_prom_obj = KubernetesCollector(kubernetes_prom_url)
+        # keep-alive sessions per Prometheus host, shared by all clusters and collection cycles
+        self.session_pool = PrometheusSessionPool()
+        self.init(prometheus_url, kubernetes_prom_url)
 
     def init(self, prometheus_url: str, kubernetes_prom_url):
-        self.prom_obj = PrometheusCollector(prometheus_url)
-        self.kube_prom_obj = KubernetesCollector(kubernetes_prom_url)
+        self.prom_obj = PrometheusCollector(prometheus_url, self.session_pool)
+        self.kube_prom_obj = KubernetesCollector(kubernetes_prom_url, self.session_pool)
+
+    async def close(self) -> None:
+        await self.session_pool.close()
 
-    async def collect_cold_starts(self, start: int, end: int) -> DataFrame:
+    async def collect_cold_starts(self, start: int, end: int, resolution: int = None) -> DataFrame:
         """ Collects cold starts for FaaS functions.
         It uses PrometheusCollector's query_prometheus function.
         Args:
@@ -43,15 +49,17 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, 60 if not set
         Returns:
             DataFrame - The result as Dataframe with the columns: 'timestamp', 'action' and 'cold_starts'
         """
 
-        query = "increase(openwhisk_action_coldStarts_total[1m])"
-        frame = await self.prom_obj.query_prometheus(query, "cold_starts", start, end, True)
+        query = "increase(openwhisk_action_coldStarts_total[$step])"
+        frame = await self.prom_obj.query_prometheus(query, "cold_starts", start, end, True, resolution=resolution)
         return frame
 
-    async def collect_function_invocations(self, start: int, end: int) -> DataFrame:
+    async def collect_function_invocations(self, start: int, end: int, resolution: int = None) -> DataFrame:
         """ Collects function invocations for FaaS functions.
         It uses PrometheusCollector's query_prometheus function.
         Args:
@@ -59,17 +67,19 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, 60 if not set
         Returns:
             DataFrame - The result as Dataframe with the columns: 'timestamp', 'action' and 'invocations'
         """
 
-        query = "increase(openwhisk_action_activations_total[1m])"
-        frame = await self.prom_obj.query_prometheus(query, "invocations", start, end, True)
+        query = "increase(openwhisk_action_activations_total[$step])"
+        frame = await self.prom_obj.query_prometheus(query, "invocations", start, end, True, resolution=resolution)
         #frame = frame[frame["action"]=="myservice-dev-nodeinfo"]
         #print(frame.action.values)
         return frame
 
-    async def collect_function_memory(self, start: int, end: int) -> DataFrame:
+    async def collect_function_memory(self, start: int, end: int, resolution: int = None) -> DataFrame:
         """ Collects function invocations for FaaS functions.
         It uses PrometheusCollector's query_prometheus function.
         Args:
@@ -77,15 +87,17 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, 60 if not set
         Returns:
             DataFrame - The result as Dataframe with the columns: 'timestamp', 'action' and 'invocations'
         """
 
         query = "openwhisk_action_memory"
-        frame = await self.prom_obj.query_prometheus(query, "memory", start, end, True)
+        frame = await self.prom_obj.query_prometheus(query, "memory", start, end, True, resolution=resolution)
         return frame
 
-    async def collect_function_runtimes(self, start: int, end: int) -> DataFrame:
+    async def collect_function_runtimes(self, start: int, end: int, resolution: int = None) -> DataFrame:
         """ Collects function runtimes for FaaS functions.
         It uses PrometheusCollector's query_prometheus function.
         Args:
@@ -93,15 +105,17 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, 60 if not set
         Returns:
             DataFrame - The result as Dataframe with the columns: 'timestamp', 'action' and 'runtime'
         """
 
-        query = "increase(openwhisk_action_duration_seconds_sum[1m])"
-        frame = await self.prom_obj.query_prometheus(query, "execution_times", start, end, True)
+        query = "increase(openwhisk_action_duration_seconds_sum[$step])"
+        frame = await self.prom_obj.query_prometheus(query, "execution_times", start, end, True, resolution=resolution)
         return frame
 
-    async def collect_function_initialization_times(self, start: int, end: int) -> DataFrame:
+    async def collect_function_initialization_times(self, start: int, end: int, resolution: int = None) -> DataFrame:
         """ Collects function initialization times for FaaS functions.
         It uses PrometheusCollector's query_prometheus function.
         Args:
@@ -109,13 +123,15 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, 60 if not set
         Returns:
             DataFrame - The result as Dataframe with the columns: 'timestamp', 'action' and 'inittime'
         """
 
         # TODO: maybe find sth better than average init time; Maybe bucket in combination with coldstarts?
-        query = "increase(openwhisk_action_initTime_seconds_sum[1m])"
-        frame = await self.prom_obj.query_prometheus(query, "init_time", start, end, True)
+        query = "increase(openwhisk_action_initTime_seconds_sum[$step])"
+        frame = await self.prom_obj.query_prometheus(query, "init_time", start, end, True, resolution=resolution)
         return frame
 
     def postprocess_relative_to_invocations(self, frame: DataFrame, measurement: str) -> DataFrame:
@@ -139,7 +155,8 @@ class OpenWhiskCollector(BaseCollector):
 
         return frame
 
-    async def collect(self, config_object: object, cluster_name: str, start: int, end: int) -> DataFrame:
+    async def collect(self, config_object: object, cluster_name: str, start: int, end: int,
+                      resolution: int = None) -> DataFrame:
         """ Collects function cold starts, invocations, initialization time and runtime for a Target from the configured prometheus instance.
 
         Args:
@@ -149,6 +166,8 @@ class OpenWhiskCollector(BaseCollector):
                 Integer - A timestamp, where the query range should start
             end:
                 Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - seconds between two points, raised for long windows, 60 if not set
 
         Returns:
             DataFrame - Query result as DataFrame - with columns: 'timestamp', 'target', 'action' and measurement fields(s)
@@ -156,35 +175,31 @@ class OpenWhiskCollector(BaseCollector):
 
         # start each worker
         tasks: List[asyncio.Task] = [
-            asyncio.create_task(self.collect_cold_starts(start, end)),
-            asyncio.create_task(self.collect_function_invocations(start, end)),
-            asyncio.create_task(self.collect_function_runtimes(start, end)),
-            asyncio.create_task(self.collect_function_initialization_times(start, end)),
-            asyncio.create_task(self.collect_function_memory(start, end))
+            asyncio.create_task(self.collect_cold_starts(start, end, resolution)),
+            asyncio.create_task(self.collect_function_invocations(start, end, resolution)),
+            asyncio.create_task(self.collect_function_runtimes(start, end, resolution)),
+            asyncio.create_task(self.collect_function_initialization_times(start, end, resolution)),
+            asyncio.create_task(self.collect_function_memory(start, end, resolution))
             #asyncio.create_task(self.kube_prom_obj.collect_replicas(start, end))
         ]
 
-        # wait for all workers
-        combined_frame = DataFrame()
+        # wait for all workers, a failed query fails the window
+        frames = []
         try:
-            # wait for max 45 seconds
+            # wait for max 10 seconds
             for result in asyncio.as_completed(tasks, timeout=10.0):
-                frame = await result
-
-                if combined_frame.empty:
-                    combined_frame = frame
-                else:
-                    combined_frame = pd.merge(combined_frame, frame, on=['timestamp', 'action'])
-                    #print(combined_frame)
-
-            # Divide by invocations & interpolate
-            # If no value exists -> just insert empty values
-            combined_frame = self.postprocess_relative_to_invocations(combined_frame, 'inittime')
-            combined_frame = self.postprocess_relative_to_invocations(combined_frame, 'runtime')
-
-        except Exception as e:
-            print("Exception when tyring to query data")
-            print(e)
-            traceback.print_exc()
+                frames.append(await result)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # all queries share the step of the window
+        step = get_step(start, end, resolution or self.prom_obj.step)
+        combined_frame = align_frames(frames, step, ("action",), frame_aggregations, frame_fill)
+
+        # Divide by invocations & interpolate
+        # If no value exists -> just insert empty values
+        combined_frame = self.postprocess_relative_to_invocations(combined_frame, 'inittime')
+        combined_frame = self.postprocess_relative_to_invocations(combined_frame, 'runtime')
 
         return self.prom_obj.do_frame_postprocessing(combined_frame, cluster_name, "function_usage")
\ No newline at end of file
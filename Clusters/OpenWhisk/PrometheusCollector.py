@@ -2,43 +2,99 @@
 import subprocess
 import sys
 import os
-from Clusters import BaseCollector
+from Clusters.BaseCollector import BaseCollector, CollectionError
 import logging
 import json
 import yaml
 
-logging.basicConfig(filename='Logs/log.log', format='%(message)s', filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+import numpy as np
 from pandas import DataFrame
 import pandas as pd
-import google.cloud
-from google.cloud import monitoring_v3
-from google.oauth2 import service_account
 from typing import List, Tuple
 
 import traceback
 import asyncio
 import os
 import time
-import asyncio
-import aiohttp
-from aiohttp_requests import requests
 from abc import abstractmethod
+from .PrometheusSessionPool import PrometheusSessionPool
+
+# seconds between two points if no resolution is requested
+default_step = 60
+# Prometheus rejects range queries with more points per series, longer ranges are split into sub-ranges
+max_points_per_query = 10000
+# points per series of a whole query, the step of longer windows is raised to bound time and memory
+max_points_per_series = 50000
+# replaced by the step in the queries, e.g. increase(metric[$step]) counts exactly the increase of each point
+step_placeholder = "$step"
+
+
+def get_step(start: int, end: int, resolution: int = None) -> int:
+    """ Picks the step of a range query, the requested resolution unless the window would have more than
+    max_points_per_series points, then the smallest multiple of the default step which keeps it below
+        Args:
+            start:
+                Integer - A timestamp, where the query range should start
+            end:
+                Integer - A timestamp, where the query range should end
+            resolution:
+                Integer, optional - requested seconds between two points, default_step if not set
+        Returns:
+            Integer - the step in seconds
+    """
+    step = max(1, int(resolution or default_step))
+    points = (end - start) // step + 1
+    if points > max_points_per_series:
+        minimum = -(-(end - start) // (max_points_per_series - 1))
+        step = -(-minimum // default_step) * default_step
+    return step
+
+
+def split_range(start: int, end: int, step: int, points_per_query: int = max_points_per_query) -> list:
+    """ Splits a range into sub-ranges of at most points_per_query points. The points are aligned to multiples of
+    the step, so sub-ranges and consecutive collections share the same time grid, and a sub-range starts one step
+    after the end of the previous one, no point is queried twice.
+        Args:
+            start:
+                Integer - A timestamp, where the query range should start
+            end:
+                Integer - A timestamp, where the query range should end
+            step:
+                Integer - seconds between two points
+            points_per_query:
+                Integer, optional - maximum number of points of a sub-range
+        Returns:
+            list - (start, end) of the sub-ranges
+    """
+    first = -(-start // step) * step
+    last = end // step * step
+    ranges = []
+    while first <= last:
+        sub_end = min(last, first + (points_per_query - 1) * step)
+        ranges.append((first, sub_end))
+        first = sub_end + step
+    return ranges
 
 
 class PrometheusCollector(BaseCollector):
 
-    def __init__(self, prometheus_url: str):
+    def __init__(self, prometheus_url: str, session_pool: PrometheusSessionPool = None):
         """ Collects usage data from the openwhisk cluster
         Args:
             prometheus_url:
                 String - the url where we can find the prometheus instnace
+            session_pool:
+                PrometheusSessionPool, optional - the shared HTTP sessions, a pool owned by this collector is
+                created if not set
         """
 
         self.prometheus_url = prometheus_url
-
-        self.query_base = "/api/v1/query_range?query="
+        self.owns_session_pool = session_pool is None
+        self.session_pool = session_pool or PrometheusSessionPool()
+        self.step = default_step
+        self.points_per_query = max_points_per_query
 
     def parse_result_to_dataframe(self, measurement_field_name: str, response, multiple_actions: bool = False,
                                   action_field: str = 'action') -> DataFrame:
@@ -52,44 +108,35 @@ class PrometheusCollector(BaseCollector):
                 Boolean, optional - Indicates if the result contains measurement fields from different actions. Default: False
 
         Returns:
-            DataFrame - A DataFrame with the columns 'timestamp' and measurement_name (and action if multiple_actions is set)
+            DataFrame - A DataFrame with the columns 'timestamp' and measurement_name (and the categorical action if
+            multiple_actions is set)
         """
 
         result = response['data']['result']
+        if not multiple_actions:
+            result = result[:1]
+        return self.parse_series(measurement_field_name, result, multiple_actions, action_field)
+
+    def parse_series(self, measurement_field_name: str, result: list, multiple_actions: bool = False,
+                     action_field: str = 'action') -> DataFrame:
+        """ Converts the series of one or more range query results to a DataFrame, see parse_result_to_dataframe """
         if len(result) == 0:
             return DataFrame()
 
-        frame = DataFrame()
+        # all samples of all series are flattened once, values are strings and may be NaN, +Inf or -Inf
+        lengths = np.fromiter((len(series['values']) for series in result), dtype=np.int64, count=len(result))
+        samples = [sample for series in result for sample in series['values']]
+        timestamps = np.fromiter((sample[0] for sample in samples), dtype=np.float64, count=len(samples))
+        columns = {
+            'timestamp': timestamps.astype(np.int64),
+            measurement_field_name: np.array([sample[1] for sample in samples], dtype=np.float64),
+        }
         if multiple_actions:
-            frames = []
-
-            for action_result in result:
-                new_frame = DataFrame(action_result['values'], columns=['timestamp', measurement_field_name])
-                new_frame['action'] = action_result['metric'][action_field]
-
-                # if "kubernetes_pod_name" in action_result['metric'].keys():
-                #     new_frame['kubernetes_pod_name'] = action_result['metric']["kubernetes_pod_name"]
-                #
-                #
-                # elif "kubernetes_pod_name" not in action_result['metric'].keys() and "pod" in action_result['metric'].keys():
-                #     new_frame['kubernetes_pod_name'] = action_result['metric']["pod"]
-
-                frames.append(new_frame)
-
-            frame = pd.concat(frames, join="inner")
-        else:
-            frame = DataFrame(result[0]['values'], columns=['timestamp', measurement_field_name])
-            # action_result = result[0]
-            # if "kubernetes_pod_name" in action_result['metric'].keys():
-            #     frame['kubernetes_pod_name'] = action_result['metric']["kubernetes_pod_name"]
-            #
-            # elif "kubernetes_pod_name" not in action_result['metric'].keys() and "pod" in action_result[
-            #     'metric'].keys():
-            #     frame['kubernetes_pod_name'] = action_result['metric']["pod"]
-
-        frame[measurement_field_name] = frame[measurement_field_name].apply(lambda v: float(v))
+            actions = pd.Categorical([series['metric'].get(action_field) for series in result])
+            columns['action'] = pd.Categorical.from_codes(np.repeat(actions.codes, lengths),
+                                                          categories=actions.categories)
 
-        return frame
+        return DataFrame(columns)
 
     def do_frame_postprocessing(self, frame: DataFrame, target_name: str, measurement_category: str) -> DataFrame:
         """ Performs postprocessing on dataframes.
@@ -122,11 +169,14 @@ class PrometheusCollector(BaseCollector):
         return frame
 
     async def query_prometheus(self, query: str, measurement_field_name: str, start: int, end: int,
-                               multiple_actions: bool = False, action_field: str = "action") -> DataFrame:
+                               multiple_actions: bool = False, action_field: str = "action",
+                               resolution: int = None) -> DataFrame:
         """ Queries the configured Prometheus instance with a given query.
+        The step is picked from the window and the resolution, ranges with more than points_per_query points are
+        split into aligned sub-ranges which are queried in parallel. CollectionError is raised if one of them fails.
         Args:
             query:
-                String - The query that should be executed
+                String - The query that should be executed, $step is replaced by the step, e.g. increase(x[$step])
             measurement_field_name:
                 String - Name of the measurement (=values from query result)
             start:
@@ -137,20 +187,38 @@ class PrometheusCollector(BaseCollector):
                 Boolean, Optional - Indicates if the query returns measurement fields for multiple actions. Default: False
             action_field:
                 String, Optional - The field that carries the action name. Default: "action"
+            resolution:
+                Integer, Optional - Requested seconds between two points. Default: self.step
 
         Returns:
             DataFrame - The processed DataFrame with the columns 'timestamp', 'target' and measurement_field_name(s) (and 'action' if multiple_actions is set)
         """
-        url = self.prometheus_url + self.query_base + query + "&start={}&end={}&step=60".format(start, end)
-
-        prometheus_request = await requests.get(url)
+        step = get_step(start, end, resolution or self.step)
+        query = query.replace(step_placeholder, str(step) + "s")
+        ranges = split_range(start, end, step, self.points_per_query)
+        responses = await asyncio.gather(*(
+            self.session_pool.query_range(self.prometheus_url, query, sub_start, sub_end, step)
+            for sub_start, sub_end in ranges))
+
+        # a missing sub-range would leave a gap, the whole range is reported as failed
+        if not responses or any(response is None for response in responses):
+            raise CollectionError("Prometheus query " + measurement_field_name + " from " + str(start) + " to " +
+                                  str(end) + " failed")
 
         # get result and parse
-        if prometheus_request.status == 200:
-            response = await prometheus_request.json()
-            return self.parse_result_to_dataframe(measurement_field_name, response, multiple_actions, action_field)
+        result = []
+        for response in responses:
+            series = response['data']['result']
+            result.extend(series if multiple_actions else series[:1])
+        frame = self.parse_series(measurement_field_name, result, multiple_actions, action_field)
+        if len(ranges) > 1 and not frame.empty:
+            keys = ['timestamp', 'action'] if multiple_actions else ['timestamp']
+            frame = frame.drop_duplicates(subset=keys, keep='last').reset_index(drop=True)
+        return frame
 
-        return DataFrame()
+    async def close(self) -> None:
+        if self.owns_session_pool:
+            await self.session_pool.close()
 
     @abstractmethod
     async def collect(self, config_object: object, cluster_name: str, start: int, end: int) -> DataFrame:
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+import asyncio
+import logging
+import random
+from urllib.parse import urlsplit
+
+import aiohttp
+
+try:
+    # decodes large range query responses several times faster than json
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+logger = logging.getLogger(__name__)
+
+# open connections per Prometheus host, the collectors of a cluster query it concurrently
+default_limit_per_host = 8
+# seconds an idle connection is kept open, longer than the collection interval so cycles reuse it
+default_keepalive_timeout = 75
+default_timeout = 30
+default_connect_timeout = 5
+# attempts of a query, the backoff before a retry is drawn uniformly up to the doubled base
+default_retries = 3
+default_backoff = 0.5
+default_max_backoff = 10
+# responses worth retrying, the server is overloaded or restarting
+retry_statuses = (429, 502, 503, 504)
+
+
+class PrometheusSessionPool:
+    """ One keep-alive aiohttp ClientSession per Prometheus host, shared by all clusters and collection cycles
+    e.g. `response = await pool.query_range("http://prometheus:9090", "openwhisk_action_memory", start, end)`
+
+    """
+
+    def __init__(self, limit_per_host: int = default_limit_per_host, timeout: float = default_timeout,
+                 retries: int = default_retries, backoff: float = default_backoff,
+                 max_backoff: float = default_max_backoff):
+        """
+        Args:
+            limit_per_host:
+                Integer, optional - maximum number of open connections per host
+            timeout:
+                Float, optional - seconds a request may take in total
+            retries:
+                Integer, optional - maximum number of attempts of a request
+            backoff:
+                Float, optional - base of the exponential backoff in seconds
+            max_backoff:
+                Float, optional - maximum backoff in seconds
+        """
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=default_connect_timeout)
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sessions = {}
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        """ Returns the session of the host of a url, it is created on first use in the running event loop """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=default_keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, raise_for_status=False)
+            self.sessions[key] = session
+        return session
+
+    def get_backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def get_json(self, url: str, params: dict):
+        """ Sends a GET request and returns the decoded JSON body, retries connection errors, timeouts and
+        overloaded servers
+            Args:
+                url:
+                    String - url without the query string
+                params:
+                    dict - query parameters, they are url encoded
+            Returns:
+                Object - the decoded response, None if the request failed
+        """
+        session = self.get_session(url)
+        for attempt in range(self.retries):
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        return loads(await response.read())
+                    body = await response.text()
+                    if response.status not in retry_statuses:
+                        logger.error("Prometheus request %s failed with status %d: %s", url, response.status,
+                                     body[:200])
+                        return None
+                    logger.warning("Prometheus request %s returned status %d, attempt %d of %d", url,
+                                   response.status, attempt + 1, self.retries)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                logger.warning("Prometheus request %s failed: %r, attempt %d of %d", url, exc, attempt + 1,
+                               self.retries)
+            if attempt + 1 < self.retries:
+                await asyncio.sleep(self.get_backoff(attempt))
+
+        logger.error("Prometheus request %s failed after %d attempts", url, self.retries)
+        return None
+
+    async def query_range(self, prometheus_url: str, query: str, start: int, end: int, step: int = 60):
+        """ Runs a range query
+            Args:
+                prometheus_url:
+                    String - the url of the Prometheus instance, e.g. http://prometheus:9090
+                query:
+                    String - PromQL query
+                start:
+                    Integer - A timestamp, where the query range should start
+                end:
+                    Integer - A timestamp, where the query range should end
+                step:
+                    Integer, optional - seconds between two points
+            Returns:
+                Object - the decoded response, None if the query failed
+        """
+        url = prometheus_url.rstrip("/") + "/api/v1/query_range"
+        return await self.get_json(url, {"query": query, "start": start, "end": end, "step": step})
+
+    async def close(self) -> None:
+        """ Closes all sessions and their connections """
+        sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            await session.close()
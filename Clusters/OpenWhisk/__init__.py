@@ -1,4 +1,9 @@
-from .OpenwhiskDeploy import OpenWhiskDeployment
-from .OpenWhiskCollector import OpenWhiskCollector
-from .PrometheusCollector import PrometheusCollector
-from .KubernetesCollector import KubernetesCollector
\ No newline at end of file
+from Clusters.ProviderRegistry import lazy_attribute
+
+_lazy_exports = {
+    "OpenWhiskDeployment": ".OpenwhiskDeploy",
+}
+
+
+def __getattr__(name):
+    return lazy_attribute(__name__, _lazy_exports, name)
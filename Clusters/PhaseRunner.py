@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+import asyncio
+import logging
+import os
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+default_command_timeout = 30 * 60
+# seconds a killed process gets to exit after SIGTERM before it is killed with SIGKILL
+kill_grace_period = 5
+read_chunk_size = 64 * 1024
+# longer lines are cut, so a process without newlines can not grow the buffer without bounds
+max_line_length = 64 * 1024
+timeout_exit_code = 124
+# exit code of a command which could not be started, like a shell reports a missing command
+start_failure_exit_code = 127
+
+
+def emit(on_event, event: dict) -> None:
+    """ Passes a structured event to the callback and never lets the callback break a deployment """
+    if on_event is None:
+        return
+    try:
+        on_event(event)
+    except Exception as e:
+        logger.error("Phase event callback failed: %s", e)
+
+
+async def stream_lines(stream: asyncio.StreamReader, stream_name: str, command: str, on_event) -> int:
+    """ Reads a process stream incrementally and forwards every line to the logger as it arrives
+        Args:
+            stream:
+                StreamReader - stdout or stderr of the process
+            stream_name:
+                String - "stdout" or "stderr"
+            command:
+                String - the command, for the line events
+            on_event:
+                Callable, optional - receives a "line" event per line
+        Returns:
+            Integer - number of bytes read
+    """
+    level = logging.DEBUG if stream_name == "stdout" else logging.WARNING
+    total_bytes = 0
+    buffer = b""
+
+    def forward(raw_line: bytes) -> None:
+        line = raw_line.decode(errors='replace').rstrip("\r")
+        logger.log(level, line)
+        emit(on_event, {"event": "line", "command": command, "stream": stream_name, "line": line})
+
+    while True:
+        chunk = await stream.read(read_chunk_size)
+        if not chunk:
+            break
+        total_bytes += len(chunk)
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw_line in lines:
+            forward(raw_line)
+        if len(buffer) > max_line_length:
+            forward(buffer[:max_line_length])
+            buffer = b""
+
+    if buffer:
+        forward(buffer)
+    return total_bytes
+
+
+async def kill_process(process: asyncio.subprocess.Process) -> None:
+    """ Terminates the process group of a command, the command itself may have started children """
+    if process.returncode is not None:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), kill_grace_period)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def run_command(command: str, path_function: str, env: dict = None, timeout: float = default_command_timeout,
+                      on_event=None) -> int:
+    """ Asynchronous function which runs a single phase command without blocking the event loop.
+    stdout and stderr are streamed to the logger, the command is killed once it runs longer than timeout.
+        Args:
+            command:
+                String - the command line to execute, split on whitespace
+            path_function:
+                String - working directory of the command (path of source code)
+            env:
+                dict, optional - environment of the process, e.g. with the cluster credentials
+            timeout:
+                Float, optional - seconds after which the command is killed, None for no limit
+            on_event:
+                Callable, optional - receives the structured "command_start", "line" and "command_end" events
+        Returns:
+            Integer - exit code of the command, 124 if it timed out, 127 if it could not be started, a command
+            aborted by the timeout of its phase also ends with a command_end event with 124
+    """
+    start = time.time()
+    emit(on_event, {"event": "command_start", "command": command, "cwd": path_function, "time": start})
+    timed_out = False
+    stdout_bytes = stderr_bytes = 0
+
+    def command_end(return_code: int) -> None:
+        emit(on_event, {"event": "command_end", "command": command, "cwd": path_function, "exit_code": return_code,
+                        "duration": time.time() - start, "stdout_bytes": stdout_bytes, "stderr_bytes": stderr_bytes,
+                        "timed_out": timed_out})
+
+    try:
+        process = await asyncio.create_subprocess_exec(*command.split(), cwd=path_function, env=env,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE,
+                                                       start_new_session=True)
+    except OSError as exc:
+        # e.g. serverless or gcloud is not installed
+        logger.error("Command '%s' in %s could not be started: %s", command, path_function, exc)
+        command_end(start_failure_exit_code)
+        return start_failure_exit_code
+
+    # a process may close its streams and keep running, the timeout covers its exit too
+    completion = asyncio.gather(stream_lines(process.stdout, "stdout", command, on_event),
+                                stream_lines(process.stderr, "stderr", command, on_event),
+                                process.wait())
+    try:
+        stdout_bytes, stderr_bytes, return_code = await asyncio.wait_for(asyncio.shield(completion), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        logger.error("Command '%s' in %s timed out after %ss", command, path_function, timeout)
+        await kill_process(process)
+        completion.cancel()
+        await asyncio.gather(completion, return_exceptions=True)
+        return_code = timeout_exit_code
+    except asyncio.CancelledError:
+        # the phase timed out or the deployment was cancelled, never leave the process behind
+        timed_out = True
+        logger.error("Command '%s' in %s was aborted with its phase", command, path_function)
+        await kill_process(process)
+        completion.cancel()
+        command_end(timeout_exit_code)
+        raise
+
+    if return_code != 0 and not timed_out:
+        logger.error("Command '%s' in %s exited with %d", command, path_function, return_code)
+
+    command_end(return_code)
+    return return_code
+
+
+async def run_phase(commands: list, path_function: str, env: dict = None,
+                    command_timeout: float = default_command_timeout, phase_timeout: float = None,
+                    on_event=None) -> bool:
+    """ Asynchronous function which runs the commands of a phase one after another
+        Args:
+            commands:
+                list - list of phase commands
+            path_function:
+                String - working directory of the commands (path of source code)
+            env:
+                dict, optional - environment of the processes
+            command_timeout:
+                Float, optional - seconds after which a single command is killed
+            phase_timeout:
+                Float, optional - seconds after which the whole phase is aborted, None for no limit
+            on_event:
+                Callable, optional - receives the structured events of all commands
+        Returns:
+            Boolean - True if every command exited with 0
+    """
+    async def run_commands() -> bool:
+        success = True
+        for command in commands:
+            return_code = await run_command(command, path_function, env, command_timeout, on_event)
+            success = success and return_code == 0
+        return success
+
+    try:
+        return await asyncio.wait_for(run_commands(), phase_timeout)
+    except asyncio.TimeoutError:
+        logger.error("Phase %s in %s timed out after %ss", commands, path_function, phase_timeout)
+        emit(on_event, {"event": "phase_timeout", "commands": commands, "cwd": path_function,
+                        "timeout": phase_timeout})
+        return False
+
+
+def phase_options(config_object: object, phase: str) -> dict:
+    """ Reads the optional timeouts of a phase from the cluster configuration
+        Args:
+            config_object:
+                Object - configuration of the cluster
+            phase:
+                String - name of the phase, e.g. post_init
+        Returns:
+            dict - keyword arguments for run_phase
+    """
+    phase_config = config_object["phases"][phase]
+    return {
+        "command_timeout": phase_config.get("command_timeout", default_command_timeout),
+        "phase_timeout": phase_config.get("timeout")
+    }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+import importlib
+import sys
+
+# provider name under `providers:` in the configuration -> (module, class)
+# the modules are only imported when a provider is used, they pull in the heavy provider SDKs
+deployers = {
+    "openwhisk": ("Clusters.OpenWhisk.OpenwhiskDeploy", "OpenWhiskDeployment"),
+    "google": ("Clusters.Google.GoogleDeploy", "GoogleDeployment"),
+    "aws": ("Clusters.AWS.AWSDeploy", "AWSDeployment"),
+}
+
+collectors = {
+    "openwhisk": ("Clusters.OpenWhisk.OpenWhiskCollector", "OpenWhiskCollector"),
+    "google": ("Clusters.Google.GoogleCollector", "GCFCollector"),
+    "aws": ("Clusters.AWS.AWSCollector", "AWSCollector"),
+}
+
+
+def resolve(registry: dict, provider: str) -> type:
+    """ Imports the module of a provider and returns its class
+        Args:
+            registry:
+                dict - deployers or collectors
+            provider:
+                String - provider name, e.g. aws
+        Returns:
+            type - the deployment or collector class
+    """
+    if provider not in registry:
+        raise KeyError("Unknown provider " + provider + ", expected one of " + ", ".join(sorted(registry)))
+    module_name, class_name = registry[provider]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_deployer(provider: str) -> type:
+    return resolve(deployers, provider)
+
+
+def get_collector(provider: str) -> type:
+    return resolve(collectors, provider)
+
+
+def lazy_attribute(package: str, exports: dict, name: str):
+    """ Module __getattr__ (PEP 562) of a package, imports the module of an exported name on first access.
+    Exported names must differ from the names of the submodules, importing a submodule binds it on the package.
+    """
+    if name not in exports:
+        raise AttributeError("module " + package + " has no attribute " + name)
+    value = getattr(importlib.import_module(exports[name], package), name)
+    setattr(sys.modules[package], name, value)
+    return value
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+watermarks_file = os.path.join(".deploy-state", "watermarks.json")
+# seconds until the metrics of a minute are complete, Cloud Monitoring documents up to 240 seconds for Cloud
+# Functions, CloudWatch usually needs 1 to 3 minutes, Prometheus one scrape interval
+provider_lags = {"aws": 180, "google": 240, "openwhisk": 60}
+default_lag = 120
+# windows are aligned to the grid of the collectors
+grid = 60
+# range of the first collection of a cluster
+initial_window = 60
+# longest range of one collect call, longer catch-ups are split
+max_window = 6 * 60 * 60
+# oldest data collected after a downtime
+max_catch_up = 7 * 24 * 60 * 60
+
+
+def trim_frame(frame: DataFrame, end: int) -> DataFrame:
+    """ Drops the rows at or after the end of a window, the next window starts there
+        Args:
+            frame:
+                DataFrame - a frame of a collector with the timestamp index
+            end:
+                Integer - end of the window in epoch seconds
+        Returns:
+            DataFrame - the rows before end
+    """
+    if frame.empty:
+        return frame
+    bound = pd.Timestamp(end, unit='s', tz='UTC')
+    if getattr(frame.index, "tz", None) is None:
+        bound = bound.tz_localize(None)
+    return frame[frame.index < bound]
+
+
+class WatermarkStore:
+    """ Local store of how far the metrics of each cluster are collected
+    Every cluster has the watermark `collected_until`, the end of the last window which was written to InfluxDB,
+    the next collection starts there.
+
+    """
+
+    def __init__(self, path: str = watermarks_file, lags: dict = None):
+        """
+        Args:
+            path:
+                String - the json file which holds the watermarks
+            lags:
+                dict, optional - provider -> seconds of ingestion lag which override provider_lags
+        """
+        self.path = path
+        self.lags = {**provider_lags, **(lags or {})}
+        self.watermarks = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r') as f:
+                    self.watermarks = json.load(f)
+            except (OSError, ValueError) as exc:
+                logger.warning("Ignoring unreadable watermarks %s: %s", path, exc)
+
+    def get(self, provider: str, cluster_name: str) -> int:
+        """ Returns the end of the last written window of a cluster or None if it was never collected """
+        return self.watermarks.get(provider, {}).get(cluster_name, {}).get("collected_until")
+
+    def windows(self, provider: str, cluster_name: str, now: int = None) -> list:
+        """ Plans the windows of the next collection of a cluster, from its watermark up to now minus the lag of
+        the provider, aligned to the grid and split into windows of at most max_window seconds
+            Args:
+                provider:
+                    String - provider name, e.g. aws
+                cluster_name:
+                    String - name of the cluster
+                now:
+                    Integer, optional - current time in epoch seconds
+            Returns:
+                list - (start, end) of the windows, empty if nothing new is complete
+        """
+        now = int(time.time()) if now is None else now
+        end = (now - self.lags.get(provider, default_lag)) // grid * grid
+        start = self.get(provider, cluster_name)
+        if start is None:
+            start = end - initial_window
+        elif start < end - max_catch_up:
+            logger.warning("%s/%s was last collected at %d, only the last %d seconds are collected", provider,
+                           cluster_name, start, max_catch_up)
+            start = end - max_catch_up
+
+        windows = []
+        while start < end:
+            windows.append((start, min(end, start + max_window)))
+            start = windows[-1][1]
+        return windows
+
+    def commit(self, provider: str, cluster_name: str, end: int) -> None:
+        """ Moves the watermark of a cluster to the end of a window, call it after the window was written
+            Args:
+                provider:
+                    String - provider name, e.g. aws
+                cluster_name:
+                    String - name of the cluster
+                end:
+                    Integer - end of the written window in epoch seconds
+        """
+        self.watermarks.setdefault(provider, {})[cluster_name] = {"collected_until": int(end)}
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.watermarks, f, indent=4)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+import os
+import shutil
+import logging
+import yaml
+
+logger = logging.getLogger(__name__)
+
+workspaces_root = ".workspaces"
+
+# files which are rendered per cluster and therefore never linked from the source tree
+rendered_files = ("serverless.yml", "config.json")
+# directories which belong to a single deployment and are never shared
+ignored_dirs = (".serverless",)
+
+
+def function_name(path_function: str) -> str:
+    """ Returns the function name of a source path, e.g. nodeinfo for ./Functions/nodeinfo/aws/ """
+    return os.path.basename(os.path.dirname(os.path.normpath(path_function)))
+
+
+def deployment_name(cluster_name: str, path_function: str) -> str:
+    """ Identifies the deployment of a function on a cluster, e.g. ow_cluster1/nodeinfo """
+    return cluster_name + "/" + function_name(path_function)
+
+
+def workspace_path(provider: str, cluster_name: str, path_function: str) -> str:
+    """ Returns the workspace directory of a function on a cluster
+        Args:
+            provider:
+                String - provider name, e.g. aws
+            cluster_name:
+                String - name of the cluster
+            path_function:
+                String - path of source code
+        Returns:
+            String - path of the workspace, ending with a separator like the paths in the config
+    """
+    return os.path.join(workspaces_root, provider, cluster_name, function_name(path_function)) + os.sep
+
+
+def link_file(source: str, destination: str) -> None:
+    """ Hardlinks a file, falls back to a copy if the workspace is on another file system """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def link_tree(source_dir: str, target_dir: str, exclude: tuple = ()) -> None:
+    """ Recreates a directory tree by hardlinking every file of it
+        Args:
+            source_dir:
+                String - directory which should be linked
+            target_dir:
+                String - directory where the tree is created
+            exclude:
+                tuple, optional - top level files and directories of source_dir which are skipped
+    """
+    for root, dirs, files in os.walk(source_dir):
+        relative_root = os.path.relpath(root, source_dir)
+        if relative_root == os.curdir:
+            dirs[:] = [d for d in dirs if d not in exclude]
+            files = [f for f in files if f not in exclude]
+        target_root = os.path.normpath(os.path.join(target_dir, relative_root))
+        os.makedirs(target_root, exist_ok=True)
+        for file in files:
+            source = os.path.join(root, file)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), os.path.join(target_root, file))
+            else:
+                link_file(source, os.path.join(target_root, file))
+
+
+def prepare_workspace(path_function: str, provider: str, cluster_name: str, exclude: tuple = ()) -> str:
+    """ Materializes an isolated workspace of the function source for one cluster.
+    Every file is hardlinked from the source tree, so node_modules is not copied, while per-cluster
+    files like serverless.yml are written separately into the workspace.
+        Args:
+            path_function:
+                String - path of source code
+            provider:
+                String - provider name, e.g. aws
+            cluster_name:
+                String - name of the cluster
+            exclude:
+                tuple, optional - additional top level entries of the source which are not linked
+        Returns:
+            String - path of the workspace
+    """
+    workspace = workspace_path(provider, cluster_name, path_function)
+    # keep the .serverless state of the previous deployment, refresh everything else
+    if os.path.isdir(workspace):
+        for entry in os.listdir(workspace):
+            if entry in ignored_dirs:
+                continue
+            entry_path = os.path.join(workspace, entry)
+            if os.path.isdir(entry_path) and not os.path.islink(entry_path):
+                shutil.rmtree(entry_path)
+            else:
+                os.unlink(entry_path)
+    os.makedirs(workspace, exist_ok=True)
+
+    link_tree(path_function, workspace, rendered_files + ignored_dirs + tuple(exclude))
+
+    logger.debug("Prepared workspace %s from %s", workspace, path_function)
+    return workspace
+
+
+def write_rendered_file(workspace: str, file_name: str, content: str) -> None:
+    """ Writes a per-cluster file into the workspace without touching the source tree """
+    target = os.path.join(workspace, file_name)
+    if os.path.lexists(target):
+        # never write through a hardlink into the source tree
+        os.unlink(target)
+    with open(target, 'w') as stream:
+        stream.write(content)
+
+
+def render_serverless_yaml(yaml_data: dict) -> str:
+    """ Renders the serverless.yml of a cluster, it is written into the workspace with write_rendered_file """
+    return yaml.dump(yaml_data)
+
+
+def rendered_serverless_yaml_path(path_function: str, provider: str, cluster_name: str) -> str:
+    """ Returns the serverless.yml a function was deployed with, or the one of the source tree if it was never staged """
+    rendered = workspace_path(provider, cluster_name, path_function) + 'serverless.yml'
+    if os.path.isfile(rendered):
+        return rendered
+    return path_function + 'serverless.yml'
@@ -1,8 +1,18 @@
 from .BaseDeploy import BaseDeployment
-from .BaseCollector import BaseCollector
-from .OpenWhisk import OpenWhiskDeployment
-from .Google import GoogleDeployment
-from .AWS import AWSDeployment
-from .Google import GCFCollector
-from .OpenWhisk import OpenWhiskCollector
-from .AWS import AWSCollector
\ No newline at end of file
+from .DeploymentScheduler import DeploymentScheduler
+from .ProviderRegistry import get_deployer, get_collector, lazy_attribute
+
+# the providers are imported on first access, see ProviderRegistry. Names of submodules are never exported, e.g.
+# the collector base class is imported with `from Clusters.BaseCollector import BaseCollector`
+_lazy_exports = {
+    "OpenWhiskDeployment": ".OpenWhisk.OpenwhiskDeploy",
+    "GoogleDeployment": ".Google.GoogleDeploy",
+    "AWSDeployment": ".AWS.AWSDeploy",
+    "GCFCollector": ".Google.GoogleCollector",
+    "OpenWhiskCollector": ".OpenWhisk.OpenWhiskCollector",
+    "AWSCollector": ".AWS.AWSCollector",
+}
+
+
+def __getattr__(name):
+    return lazy_attribute(__name__, _lazy_exports, name)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+import logging
+from dataclasses import dataclass, field
+from typing import Mapping, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# the C LibYAML loader is much faster on large configurations, fall back to the pure python one
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+phase_names = ("init", "post_init", "delete")
+
+
+class ConfigError(ValueError):
+    """ Raised if the configuration file can not be parsed or is invalid """
+    pass
+
+
+class FrozenDict(dict):
+    """ Read-only dict of the configuration.
+    It stays a dict, so it can still be serialized with json, while every attempt to change it raises a TypeError.
+    A deepcopy returns a plain, mutable dict.
+
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("The configuration is immutable")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    """ Recursively converts dicts to FrozenDicts and lists to tuples """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """ Recursively converts a frozen value back to mutable dicts and lists """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class Config:
+    """ Parsed and validated configuration
+    providers is the index provider name -> cluster name -> cluster configuration, so clusters are looked up
+    in O(1) instead of looping over all providers and clusters.
+
+    """
+    name: str
+    providers: Mapping[str, Mapping[str, Mapping]]
+    functions: Tuple = ()
+    influxdb: Mapping = field(default_factory=FrozenDict)
+    path: str = ""
+
+    def clusters(self, provider: str) -> Mapping:
+        """ Returns all clusters of a provider, an empty mapping if the provider is not configured """
+        return self.providers.get(provider, FrozenDict())
+
+    def cluster(self, provider: str, cluster_name: str) -> Mapping:
+        """ Returns the configuration of a cluster or None """
+        return self.clusters(provider).get(cluster_name)
+
+    def select(self, provider: str, providers_list: list = None, all_clusters: bool = False) -> list:
+        """ Selects clusters of a provider
+            Args:
+                provider:
+                    String - provider name, e.g. aws
+                providers_list:
+                    list, optional - names of the selected clusters
+                all_clusters:
+                    bool, optional - select all clusters of the provider
+            Returns:
+                list - (cluster_name, cluster configuration) tuples
+        """
+        clusters = self.clusters(provider)
+        if all_clusters:
+            return list(clusters.items())
+
+        selected = []
+        for cluster_name in providers_list or []:
+            if cluster_name in clusters:
+                selected.append((cluster_name, clusters[cluster_name]))
+            else:
+                logger.warning("Cluster %s is not configured for provider %s", cluster_name, provider)
+        return selected
+
+
+def validate_cluster(location: str, cluster) -> None:
+    """ Checks the structure of a cluster configuration and raises a ConfigError with its location """
+    if not isinstance(cluster, dict):
+        raise ConfigError(location + ": must be a mapping")
+    if not isinstance(cluster.get('auth'), dict):
+        raise ConfigError(location + ": missing 'auth' mapping")
+    for key in ('meta', 'monitoring'):
+        if key in cluster and not isinstance(cluster[key], dict):
+            raise ConfigError(location + "." + key + ": must be a mapping")
+    interval = (cluster.get('meta') or {}).get('collection_interval')
+    if interval is not None and (isinstance(interval, bool) or not isinstance(interval, int) or interval <= 0):
+        raise ConfigError(location + ".meta.collection_interval: must be a positive number of seconds")
+    if 'path' in cluster and not isinstance(cluster['path'], str):
+        raise ConfigError(location + ".path: must be a string")
+    if 'functions' in cluster and not isinstance(cluster['functions'], list):
+        raise ConfigError(location + ".functions: must be a list")
+    if 'phases' in cluster:
+        if not isinstance(cluster['phases'], dict):
+            raise ConfigError(location + ".phases: must be a mapping")
+        for phase in phase_names:
+            phase_config = cluster['phases'].get(phase)
+            if phase_config is None:
+                continue
+            commands = phase_config.get('commands') if isinstance(phase_config, dict) else None
+            if not isinstance(commands, list) or not all(isinstance(command, str) for command in commands):
+                raise ConfigError(location + ".phases." + phase + ".commands: must be a list of strings")
+
+
+def build_config(data, path: str = "") -> Config:
+    """ Validates parsed yaml data and builds the immutable Config """
+    if not isinstance(data, dict):
+        raise ConfigError(path + ": the configuration must be a mapping")
+
+    providers = data.get('providers') or {}
+    if not isinstance(providers, dict):
+        raise ConfigError(path + ": 'providers' must be a mapping")
+    for provider, clusters in providers.items():
+        if clusters is None:
+            continue
+        if not isinstance(clusters, dict):
+            raise ConfigError(path + ": providers." + provider + " must be a mapping of clusters")
+        for cluster_name, cluster in clusters.items():
+            validate_cluster(path + ": providers." + provider + "." + cluster_name, cluster)
+
+    functions = data.get('functions') or []
+    if not isinstance(functions, list):
+        raise ConfigError(path + ": 'functions' must be a list")
+
+    return Config(name=str(data.get('name', '')),
+                  providers=freeze({provider: clusters or {} for provider, clusters in providers.items()}),
+                  functions=freeze(functions),
+                  influxdb=freeze(data.get('influxdb') or {}),
+                  path=path)
+
+
+def load_config(configfile: str) -> Config:
+    """ Parses the configuration file once into a validated, immutable Config
+        Args:
+            configfile:
+                String - path of the configuration file
+        Returns:
+            Config - the configuration
+    """
+    try:
+        with open(configfile, 'r') as stream:
+            data = yaml.load(stream, Loader=Loader)
+    except (OSError, yaml.YAMLError) as exc:
+        raise ConfigError(str(exc)) from exc
+
+    return build_config(data, configfile)
@@ -0,0 +1 @@
+from .ConfigLoader import load_config, Config, ConfigError
\ No newline at end of file
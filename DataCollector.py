@@ -1,85 +1,172 @@
 #!/usr/bin/env python
-import yaml
 import sys, getopt
 from typing import List
 import traceback
 import asyncio
+import logging
+import functools
+import signal
+import time
 
-from Clusters import BaseCollector
-from Clusters import GCFCollector
-from Clusters import OpenWhiskCollector
-from Clusters import AWSCollector
-from datetime import datetime
+from Clusters.BaseCollector import BaseCollector
+from Clusters import get_collector
+from Clusters.CollectionScheduler import CollectionScheduler, default_interval, default_jitter
+from Clusters.Watermarks import WatermarkStore, trim_frame
 from InfluxDBWriter import InfluxDBWriter
+from ConfigLoader import load_config, Config, ConfigError
+from LogPipeline import setup_logging, log_context, log_frame
+
+logger = logging.getLogger(__name__)
 
 functions_meta = []
 logs_file = "Logs/log.log"
 
 
-async def collect_from_clusters(configfile: str, provider: str, influx_db_writer_obj: InfluxDBWriter,
-                                cluster_collector_obj: BaseCollector = None,
-                                providers_list: list = None, all_clusters: bool = False):
-    with open(configfile, 'r') as stream:
-        try:
-            data = yaml.safe_load(stream)
-            if all_clusters:
-                for cluster in data['providers'][provider]:
-                    curr_cluster = data['providers'][provider][cluster]
-                    dt = datetime.now()
-                    seconds = int(dt.strftime('%s'))
-
-                    if "monitoring" in data['providers'][provider][cluster]:
-                        cluster_collector_obj.init(data['providers'][provider][cluster]["monitoring"]['openwhisk'],
-                                                   data['providers'][provider][cluster]["monitoring"]['kubernetes']
-                                                   )
-                    df = await cluster_collector_obj.collect(curr_cluster, cluster, seconds - 1*60, seconds)
-                    print(df)
+async def collect_cluster(provider: str, cluster_name: str, curr_cluster: object,
+                          influx_db_writer_obj: InfluxDBWriter, cluster_collector_obj: BaseCollector,
+                          watermarks: WatermarkStore, lock: asyncio.Lock = None) -> dict:
+    """ Collects a cluster from its watermark up to the newest complete minute and writes it to InfluxDB
+        Args:
+            lock:
+                asyncio.Lock, optional - held while the collector is used, for collectors which are
+                re-initialised per cluster
+        Returns:
+            dict - rows written, lag in seconds of the watermark behind now and the result, failed if a window
+            could not be collected
+    """
+    rows = 0
+    result = "ok"
+    async with lock or asyncio.Lock():
+        if "monitoring" in curr_cluster:
+            cluster_collector_obj.init(curr_cluster["monitoring"]['openwhisk'],
+                                       curr_cluster["monitoring"]['kubernetes'])
+        # from the last written point up to the newest complete minute, several windows after a downtime
+        for start, end in watermarks.windows(provider, cluster_name):
+            try:
+                df = await cluster_collector_obj.collect(curr_cluster, cluster_name, start, end)
+                df = trim_frame(df, end)
+                log_frame(logger, df, provider + "/" + cluster_name)
+                if not df.empty:
                     influx_db_writer_obj.write_dataframe_influxdb(df)
+            except Exception:
+                # the watermark stays, the window is collected again in the next run
+                logger.exception("Collecting %d - %d failed", start, end)
+                result = "failed"
+                break
+            watermarks.commit(provider, cluster_name, end)
+            rows += len(df)
+
+    collected_until = watermarks.get(provider, cluster_name)
+    lag = time.time() - collected_until if collected_until is not None else None
+    return {"rows": rows, "lag": lag, "result": result}
+
+
+async def collect_from_clusters(config: Config, provider: str, influx_db_writer_obj: InfluxDBWriter,
+                                cluster_collector_obj: BaseCollector = None,
+                                providers_list: list = None, all_clusters: bool = False,
+                                watermarks: WatermarkStore = None):
+    for cluster_name, curr_cluster in config.select(provider, providers_list, all_clusters):
+        with log_context(provider=provider, cluster_name=cluster_name):
+            await collect_cluster(provider, cluster_name, curr_cluster, influx_db_writer_obj, cluster_collector_obj,
+                                  watermarks)
+
 
-            else:
-                for cluster_name in providers_list:
-                    for cluster in data['providers'][provider]:
-                        curr_cluster = data['providers'][provider][cluster]
-                        if cluster_name == cluster:
-                            dt = datetime.now()
-                            seconds = int(dt.strftime('%s'))
-                            if "monitoring" in data['providers'][provider][cluster]:
-                                cluster_collector_obj.init(
-                                    data['providers'][provider][cluster]["monitoring"]['openwhisk'],
-                                    data['providers'][provider][cluster]["monitoring"]['kubernetes']
-                                    )
-                            df = await cluster_collector_obj.collect(curr_cluster, cluster_name, seconds - 1*60, seconds)
-                            influx_db_writer_obj.write_dataframe_influxdb(df)
-                            break
-        except yaml.YAMLError as exc:
-            print(exc)
+def record_cycle(influx_db_writer_obj: InfluxDBWriter, record: dict) -> None:
+    """ Logs a finished collection cycle and writes it to the 'collection' measurement """
+    lag = record.get("lag")
+    logger.info("Collection cycle %s in %.1f s, %d rows, lag %s s, %d skipped", record["result"],
+                record["duration"], record.get("rows", 0), "-" if lag is None else "%d" % lag, record["skipped"])
+    influx_db_writer_obj.write_collection_cycles([record])
+
+
+async def run_daemon(config: Config, collectors: dict, influx_db_writer_obj: InfluxDBWriter,
+                     watermarks: WatermarkStore, interval: int, jitter: float):
+    """ Collects every cluster on its own cadence until SIGINT or SIGTERM, the collectors and their clients are
+    reused by all cycles
+        Args:
+            interval:
+                Integer - seconds between two cycles of a cluster without meta.collection_interval
+            jitter:
+                Float - maximum seconds a cycle starts after its boundary
+    """
+    scheduler = CollectionScheduler(jitter, lambda record: record_cycle(influx_db_writer_obj, record))
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, scheduler.stop)
+
+    jobs = []
+    for provider, collector in collectors.items():
+        # collectors which are re-initialised per cluster, e.g. OpenWhisk, run one cluster at a time
+        init_lock = asyncio.Lock()
+        for cluster_name, curr_cluster in config.select(provider, [], True):
+            cluster_interval = (curr_cluster.get("meta") or {}).get("collection_interval", interval)
+            lock = init_lock if "monitoring" in curr_cluster else None
+            jobs.append((provider, cluster_name, cluster_interval,
+                         functools.partial(collect_cluster, provider, cluster_name, curr_cluster,
+                                           influx_db_writer_obj, collector, watermarks, lock)))
+
+    logger.info("Collecting %d clusters", len(jobs))
+    try:
+        await scheduler.run_forever(jobs)
+    finally:
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signal_number)
 
 
 async def main(argv):
-    google_data_collector = GCFCollector()
+    configfile = "config.yaml"
+    daemon = False
+    interval = default_interval
+    jitter = default_jitter
 
-    ow_data_collector = OpenWhiskCollector()
+    try:
+        arguments, values = getopt.getopt(argv, "hc:Di:j:", ["help", "configfile=", "daemon", "interval=",
+                                                           "jitter="])
+    except getopt.GetoptError:
+        print('DataCollector.py -c <configfile path> -D <keep collecting> -i <seconds between cycles> '
+              '-j <max seconds of jitter>')
+        sys.exit(2)
 
-    aws_data_collector = AWSCollector()
+    for current_argument, current_value in arguments:
+        if current_argument in ("-h", "--help"):
+            print('python3 DataCollector.py \n -c, --configfile <configfile path, default config.yaml>'
+                  '\n -D, --daemon <keep running and collect every cluster on its interval>'
+                  '\n -i, --interval <seconds between two cycles of a cluster, default 60>'
+                  '\n -j, --jitter <max seconds a cycle starts after the full minute, default 5>')
+            return
+        elif current_argument in ("-c", "--configfile"):
+            configfile = current_value
+        elif current_argument in ("-D", "--daemon"):
+            daemon = True
+        elif current_argument in ("-i", "--interval"):
+            interval = int(current_value)
+        elif current_argument in ("-j", "--jitter"):
+            jitter = float(current_value)
 
-    influx_db_writer_obj = InfluxDBWriter("config.yaml")
+    setup_logging()
+
+    try:
+        config = load_config(configfile)
+    except ConfigError as exc:
+        print("Invalid configuration: " + str(exc))
+        sys.exit(2)
+
+    influx_db_writer_obj = InfluxDBWriter(config)
+    watermarks = WatermarkStore()
     tasks: List[asyncio.Task] = []
 
-    tasks.append(
-        asyncio.create_task(
-            collect_from_clusters("config.yaml", 'google', influx_db_writer_obj, google_data_collector, [], True)
-        )
-    )
-    tasks.append(
-        asyncio.create_task(
-            collect_from_clusters("config.yaml", 'openwhisk', influx_db_writer_obj, ow_data_collector, [], True)
-        )
-    )
-    tasks.append(
-        asyncio.create_task(
-            collect_from_clusters("config.yaml", 'aws', influx_db_writer_obj, aws_data_collector, [], True)
-        )
-    )
+    # only the collectors of the configured providers are imported
+    collectors = {provider: get_collector(provider)() for provider in ('google', 'openwhisk', 'aws')
+                  if config.clusters(provider)}
+    if daemon:
+        await run_daemon(config, collectors, influx_db_writer_obj, watermarks, interval, jitter)
+    else:
+        for provider, collector in collectors.items():
+            tasks.append(
+                asyncio.create_task(
+                    collect_from_clusters(config, provider, influx_db_writer_obj, collector, [], True, watermarks)
+                )
+            )
     # wait for all workers
     if len(tasks):
         try:
@@ -91,5 +178,8 @@ async def main(argv):
 
         print("All deployment/removal finished")
 
+    for collector in collectors.values():
+        await collector.close()
+
 if __name__ == "__main__":
     asyncio.run(main(sys.argv[1:]))
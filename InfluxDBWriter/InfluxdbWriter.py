@@ -1,29 +1,80 @@
 #!/usr/bin/env python
-import yaml
+import logging
 logs_file = "Logs/log.log"
 
+import pandas as pd
 from influxdb import DataFrameClient
+
+from ConfigLoader import load_config, ConfigError
+
+logger = logging.getLogger(__name__)
+
+
 class InfluxDBWriter:
-    def __init__(self, configfile: str):
-        with open(configfile, 'r') as stream:
+    def __init__(self, config):
+        """
+        Args:
+            config:
+                Config or String - the loaded configuration or the path of the configuration file
+        """
+        if isinstance(config, str):
             try:
-                data = yaml.safe_load(stream)
+                config = load_config(config)
+            except ConfigError as exc:
+                print(exc)
+                return
 
-                data = data['influxdb']
+        data = config.influxdb
 
-                self.client = DataFrameClient(data['hostinfo']['host'], data['hostinfo']['port'],
-                                         data['auth']['username'], data['auth']['password'],
-                                         data['database']['dbname'])
-                self.client.create_database(data['database']['dbname'])
+        self.client = DataFrameClient(data['hostinfo']['host'], data['hostinfo']['port'],
+                                      data['auth']['username'], data['auth']['password'],
+                                      data['database']['dbname'])
+        self.client.create_database(data['database']['dbname'])
 
-                self.database = data['database']['dbname']
+        self.database = data['database']['dbname']
 
-                self.protocol = data['database']['protocol']
-
-            except yaml.YAMLError as exc:
-                print(exc)
+        self.protocol = data['database']['protocol']
 
     def write_dataframe_influxdb(self, df):
 
         self.client.write_points(df, self.database, protocol=self.protocol)
-        print("Writen DataFrame")
\ No newline at end of file
+        logger.info("Written %d rows", len(df))
+
+    def write_deployment_timings(self, records: list):
+        """ Writes the timing spans of deployments as the 'deployment' measurement.
+        Args:
+            records:
+                list - records of DeploymentTimer, with the tags provider, cluster_name, function, operation,
+                phase, command and result and the fields duration and exit_code
+        """
+        if not records:
+            return
+
+        df = pd.DataFrame(records)
+        df.index = pd.to_datetime(df.pop("timestamp"), unit='s')
+        df["duration"] = df["duration"].astype(float)
+        df["exit_code"] = df["exit_code"].astype(int)
+        tag_columns = ["provider", "cluster_name", "function", "operation", "phase", "command", "result"]
+        # phase spans have no command, influx does not accept empty tag values
+        df[tag_columns] = df[tag_columns].replace("", "-")
+        self.client.write_points(df, "deployment", tag_columns=tag_columns, protocol=self.protocol)
+        logger.info("Written %d deployment timings", len(records))
+
+    def write_collection_cycles(self, records: list):
+        """ Writes the collection cycles of the daemon as the 'collection' measurement.
+        Args:
+            records:
+                list - records of CollectionScheduler, with the tags provider, cluster_name and result and the
+                fields duration, lag, rows and skipped
+        """
+        if not records:
+            return
+
+        # a failed cycle has no lag and rows
+        df = pd.DataFrame(records).reindex(columns=["timestamp", "provider", "cluster_name", "result", "duration",
+                                                    "lag", "rows", "skipped"])
+        df.index = pd.to_datetime(df.pop("timestamp"), unit='s')
+        df[["duration", "lag"]] = df[["duration", "lag"]].astype(float)
+        df[["rows", "skipped"]] = df[["rows", "skipped"]].fillna(0).astype(int)
+        tag_columns = ["provider", "cluster_name", "result"]
+        self.client.write_points(df, "collection", tag_columns=tag_columns, protocol=self.protocol)
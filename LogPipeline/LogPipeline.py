@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logs_file = os.path.join("Logs", "log.log")
+# attributes of a record which are written as structured context
+context_keys = ("provider", "cluster_name", "function", "operation")
+# seconds between two previews of the DataFrames with the same label
+frame_preview_interval = 60
+frame_preview_rows = 5
+
+_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+_last_previews = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formats a record as one JSON object per line with the context of the deployment or collection """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in context_keys:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """ Adds the context of the current task, see log_context, to every record """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """ QueueHandler which keeps the message and the exception separate, the JsonFormatter of the listener
+    formats them in the background thread
+
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_file: str = logs_file, level: int = logging.DEBUG, max_bytes: int = 10 * 1024 ** 2,
+                  backup_count: int = 5) -> None:
+    """ Sets up the logging of an entry point once.
+    Records are put on an unbounded queue, so logging never blocks the event loop, and a background
+    QueueListener writes them as JSON lines to a rotating file.
+        Args:
+            log_file:
+                String - path of the log file
+            level:
+                Integer - level of the root logger
+            max_bytes:
+                Integer - size after which the log file is rotated
+            backup_count:
+                Integer - number of rotated log files to keep
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(os.path.dirname(log_file) or os.curdir, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """ Writes the queued records and stops the background writer """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@contextmanager
+def log_context(**context):
+    """ Adds context, e.g. provider and cluster_name, to all records of the current task
+    e.g. `with log_context(provider="aws", cluster_name="aws_cluster1"): ...`
+    """
+    token = _context.set({**_context.get(), **context})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def log_frame(logger: logging.Logger, frame, label: str, interval: float = frame_preview_interval) -> None:
+    """ Logs the shape and the first rows of a DataFrame at DEBUG level, at most once per interval and label
+        Args:
+            logger:
+                Logger - the logger of the calling module
+            frame:
+                DataFrame - the frame to preview
+            label:
+                String - what the frame holds, e.g. "gcf execution_times"
+            interval:
+                Float, optional - minimum seconds between two previews with the same label
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    now = time.monotonic()
+    if now - _last_previews.get(label, float("-inf")) < interval:
+        return
+    _last_previews[label] = now
+    logger.debug("%s: %d rows x %d columns\n%s", label, frame.shape[0], frame.shape[1],
+                 frame.head(frame_preview_rows).to_string())
@@ -0,0 +1 @@
+from .LogPipeline import setup_logging, shutdown_logging, log_context, log_frame
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+""" Measures the cold start of the CLI: the time to import main.py in a fresh interpreter and which provider SDKs
+it pulls in. Run from the repository root: python3 benchmarks/import_time.py [-n runs] [-m module]
+"""
+import getopt
+import os
+import statistics
+import subprocess
+import sys
+
+# modules which must not be imported before a provider is actually used
+heavy_modules = ("boto3", "botocore", "google.cloud", "pandas", "numpy", "aiohttp", "aiohttp_requests", "influxdb")
+
+probe = """
+import sys, time
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+print(duration)
+print(",".join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def measure(module: str, runs: int) -> tuple:
+    """ Imports a module in `runs` fresh interpreters
+        Returns:
+            tuple - list of import durations in seconds, heavy modules that were loaded
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = probe.format(module=module, heavy_modules=heavy_modules)
+    durations = []
+    loaded = ""
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        duration, loaded = output.stdout.split("\n")[:2]
+        durations.append(float(duration))
+    return durations, [name for name in loaded.split(",") if name]
+
+
+def main(argv):
+    runs = 10
+    module = "main"
+    arguments, values = getopt.getopt(argv, "n:m:", ["runs=", "module="])
+    for current_argument, current_value in arguments:
+        if current_argument in ("-n", "--runs"):
+            runs = int(current_value)
+        elif current_argument in ("-m", "--module"):
+            module = current_value
+
+    durations, loaded = measure(module, runs)
+    print("import %s: min %.1f ms, median %.1f ms, max %.1f ms over %d runs" % (
+        module, min(durations) * 1000, statistics.median(durations) * 1000, max(durations) * 1000, runs))
+    if loaded:
+        print("heavy modules imported at startup: " + ", ".join(loaded))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+""" Compares the Prometheus response parser of the OpenWhisk collectors with the previous per series parser on a
+synthetic range query response. Run from the repository root:
+python3 benchmarks/prometheus_parse.py [-a actions] [-s samples per action] [-n runs]
+"""
+import getopt
+import json
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from pandas import DataFrame
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Clusters.OpenWhisk.PrometheusSessionPool import loads
+from Clusters.OpenWhisk.PrometheusCollector import PrometheusCollector
+
+
+def make_response(actions: int, samples: int) -> bytes:
+    """ Builds the body of a range query with one series per action, a few values are NaN and +Inf """
+    start = 1600000000
+    result = []
+    for action in range(actions):
+        values = [[start + 60 * i, "NaN" if i % 97 == 0 else "+Inf" if i % 101 == 0 else str(i * 0.25)]
+                  for i in range(samples)]
+        result.append({"metric": {"action": "action-%d" % action}, "values": values})
+    return json.dumps({"status": "success", "data": {"resultType": "matrix", "result": result}}).encode()
+
+
+def parse_per_series(measurement_field_name: str, response, action_field: str = 'action') -> DataFrame:
+    """ The previous parser: one DataFrame per series and a Python float call per sample """
+    frames = []
+    for action_result in response['data']['result']:
+        new_frame = DataFrame(action_result['values'], columns=['timestamp', measurement_field_name])
+        new_frame['action'] = action_result['metric'][action_field]
+        frames.append(new_frame)
+    frame = pd.concat(frames, join="inner")
+    frame[measurement_field_name] = frame[measurement_field_name].apply(lambda v: float(v))
+    return frame
+
+
+def timed(function, runs: int) -> list:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def report(name: str, durations: list) -> None:
+    print("%-28s min %8.1f ms, median %8.1f ms" % (name, min(durations) * 1000, statistics.median(durations) * 1000))
+
+
+def main(argv):
+    actions = 300
+    samples = 240
+    runs = 5
+    arguments, values = getopt.getopt(argv, "a:s:n:", ["actions=", "samples=", "runs="])
+    for current_argument, current_value in arguments:
+        if current_argument in ("-a", "--actions"):
+            actions = int(current_value)
+        elif current_argument in ("-s", "--samples"):
+            samples = int(current_value)
+        elif current_argument in ("-n", "--runs"):
+            runs = int(current_value)
+
+    body = make_response(actions, samples)
+    collector = PrometheusCollector("http://localhost:9090")
+    print("%d actions x %d samples, %.1f MB response" % (actions, samples, len(body) / 1024 ** 2))
+
+    old = parse_per_series("invocations", json.loads(body))
+    new = collector.parse_result_to_dataframe("invocations", loads(body), True)
+    pd.testing.assert_frame_equal(old.reset_index(drop=True).astype({"action": "category", "timestamp": "int64"}),
+                                  new, check_categorical=False)
+
+    report("json decode", timed(lambda: json.loads(body), runs))
+    report("fast decode (" + loads.__module__ + ")", timed(lambda: loads(body), runs))
+    response = loads(body)
+    previous = timed(lambda: parse_per_series("invocations", response), runs)
+    current = timed(lambda: collector.parse_result_to_dataframe("invocations", response, True), runs)
+    report("per series parser", previous)
+    report("vectorized parser", current)
+    print("speedup %.1fx" % (statistics.median(previous) / statistics.median(current)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
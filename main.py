@@ -1,222 +1,120 @@
 #!/usr/bin/env python
 import yaml
 import sys, getopt
-from typing import List
+from typing import List, TYPE_CHECKING
 import traceback
 import asyncio
 import json
+import logging
 
 from Clusters import BaseDeployment
-from Clusters import OpenWhiskDeployment
-from Clusters import GoogleDeployment
-from Clusters import AWSDeployment
-from Clusters import BaseCollector
-from Clusters import GCFCollector
+from Clusters import DeploymentScheduler
+from Clusters import get_deployer, get_collector
+from Clusters.Workspace import rendered_serverless_yaml_path, deployment_name, function_name
+from Clusters.DeploymentPlan import expand_plan, validate_plan
+from Clusters.DependencyCache import DependencyCache
+from Clusters.DeploymentState import DeploymentState
+from Clusters.ArtifactCache import ArtifactCache
+from Clusters.EndpointRegistry import EndpointRegistry
+from ConfigLoader import load_config, Config, ConfigError
+from LogPipeline import setup_logging, log_context, log_frame
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from Clusters.BaseCollector import BaseCollector
+
+logger = logging.getLogger(__name__)
+
 functions_meta = []
-logs_file = "Logs/log.log"
 
 
-async def deploy_to_clusters(configfile: str, provider: str, cluster_obj: BaseDeployment = None,
-                       providers_list: list = None, all_clusters: bool = False):
-    with open(configfile, 'r') as stream:
-        try:
-            data = yaml.safe_load(stream)
-            if all_clusters:
-                for cluster in data['providers'][provider]:
-                    curr_cluster = data['providers'][provider][cluster]
-                    await cluster_obj.deploy(curr_cluster, curr_cluster['path'])
-
-            else:
-                for cluster_name in providers_list:
-                    for cluster in data['providers'][provider]:
-                        curr_cluster = data['providers'][provider][cluster]
-                        if cluster_name == cluster:
-                            await cluster_obj.deploy(curr_cluster, curr_cluster['path'])
-                            break
-        except yaml.YAMLError as exc:
-            print(exc)
-
-
-async def collect_from_clusters(configfile: str, provider: str, cluster_collector_obj: BaseCollector = None,
-                       providers_list: list = None, all_clusters: bool = False):
-    with open(configfile, 'r') as stream:
-        try:
-            data = yaml.safe_load(stream)
-            if all_clusters:
-                for cluster in data['providers'][provider]:
-                    curr_cluster = data['providers'][provider][cluster]
-                    dt = datetime.now()
-                    seconds = int(dt.strftime('%s'))
-                    df = await cluster_collector_obj.collect(curr_cluster, cluster, seconds - 2*60*60, seconds)
-                    print(df)
-
-            else:
-                for cluster_name in providers_list:
-                    for cluster in data['providers'][provider]:
-                        curr_cluster = data['providers'][provider][cluster]
-                        if cluster_name == cluster:
-                            dt = datetime.now()
-                            seconds = int(dt.strftime('%s'))
-                            df = await cluster_collector_obj.collect(curr_cluster, cluster_name, seconds - 2*60*60, seconds)
-                            print(df)
-                            break
-        except yaml.YAMLError as exc:
-            print(exc)
-
-
-async def remove_from_clusters(configfile: str, provider: str, cluster_obj: BaseDeployment = None,
-                               providers_list: list = None, all_clusters: bool = False):
-    with open(configfile, 'r') as stream:
-        try:
-            data = yaml.safe_load(stream)
-            if all_clusters:
-                for cluster in data['providers'][provider]:
-                    curr_cluster = data['providers'][provider][cluster]
-                    await cluster_obj.delete(curr_cluster, curr_cluster['path'])
-
-            else:
-                for cluster_name in providers_list:
-                    for cluster in data['providers'][provider]:
-                        curr_cluster = data['providers'][provider][cluster]
-                        if cluster_name == cluster:
-                            await cluster_obj.delete(curr_cluster, curr_cluster['path'])
-                            break
-        except yaml.YAMLError as exc:
-            print(exc)
-
-
-def get_function_meta(configfile: str, provider: str, providers_list: list = None, all_clusters: bool = False):
-
-    with open(configfile, 'r') as stream:
-        try:
-            data = yaml.safe_load(stream)
-            if all_clusters:
-                for cluster in data['providers'][provider]:
-                    curr_cluster = data['providers'][provider][cluster]
-
-                    with open(curr_cluster['path'] + 'serverless.yml', 'r') as yaml_stream:
-                        try:
-                            data_serverless_yaml = yaml.safe_load(yaml_stream)
-
-                            for function in data_serverless_yaml["functions"]:
-                                if provider == "aws":
-                                    with open(logs_file) as f:
-                                        content = f.readlines()
-
-                                    func_endpoint = ""
-
-                                    for line in content:
-                                        if data_serverless_yaml["provider"]["region"] + ".amazonaws.com/dev/" + function in line:
-                                            func_endpoint = line
-                                            func_endpoint = func_endpoint.split('- ')[1]
-                                            func_endpoint = func_endpoint.replace('\n', '')
-                                            break
-
-                                    function_meta = {
-                                        "memory": data_serverless_yaml["provider"]["memorySize"],
-                                        "timeout": data_serverless_yaml["provider"]["timeout"],
-                                        "endpoint": func_endpoint,
-                                        "provider": provider,
-                                        "cluster_name": cluster
-                                    }
-                                elif provider == "openwhisk":
-                                    function_meta = {
-                                        "memory": data_serverless_yaml["provider"]["memory"],
-                                        "timeout": data_serverless_yaml["provider"]["timeout"],
-                                        "cluster_name": cluster,
-                                        "endpoint": "https://" + curr_cluster["auth"]["ow_api_host"] +
-                                                    "/api/v1/web/guest/default/" +
-                                                    data_serverless_yaml['service'] + "-dev-" + function,
-                                        "provider": provider
-                                    }
-                                elif provider == "google":
-                                    function_meta = {
-                                        "memory": data_serverless_yaml["provider"]["memorySize"],
-                                        "timeout": data_serverless_yaml["provider"]["timeout"],
-                                        "cluster_name": cluster,
-                                        "endpoint": "https://" + data_serverless_yaml["provider"][
-                                            "region"] + "-" +
-                                                    data_serverless_yaml["provider"]["project"] +
-                                                    ".cloudfunctions.net/" +
-                                                    data_serverless_yaml['service'] + "-dev-" + function,
-                                        "provider": provider
-                                    }
-                                functions_meta.append({function: function_meta})
-
-                        except yaml.YAMLError as exc:
-                            print(exc)
-
-            else:
-                for cluster_name in providers_list:
-                    for cluster in data['providers'][provider]:
-                        curr_cluster = data['providers'][provider][cluster]
-                        if cluster_name == cluster:
-                            with open(curr_cluster['path'] + 'serverless.yml', 'r') as yaml_stream:
-                                try:
-                                    data_serverless_yaml = yaml.safe_load(yaml_stream)
-
-                                    for function in data_serverless_yaml["functions"]:
-                                        if provider == "aws":
-                                            with open(logs_file) as f:
-                                                content = f.readlines()
-
-                                            func_endpoint = ""
-
-                                            for line in content:
-                                                if data_serverless_yaml["provider"]["region"] + ".amazonaws.com/dev/" \
-                                                        + function in line:
-                                                    func_endpoint = line
-                                                    func_endpoint = func_endpoint.split('- ')[1]
-                                                    func_endpoint = func_endpoint.replace('\n', '')
-                                                    break
-
-                                            function_meta = {
-                                                "memory": data_serverless_yaml["provider"]["memorySize"],
-                                                "timeout": data_serverless_yaml["provider"]["timeout"],
-                                                "endpoint": func_endpoint,
-                                                "provider": provider,
-                                                "cluster_name": cluster_name
-                                            }
-                                        elif provider == "openwhisk":
-                                            function_meta = {
-                                                "memory": data_serverless_yaml["provider"]["memory"],
-                                                "timeout": data_serverless_yaml["provider"]["timeout"],
-                                                "cluster_name": cluster_name,
-                                                "endpoint": "https://" + curr_cluster["auth"]["ow_api_host"] +
-                                                            "/api/v1/web/guest/default/" +
-                                                            data_serverless_yaml['service'] + "-dev-" + function,
-                                                "provider": provider
-                                            }
-                                        elif provider == "google":
-                                            function_meta = {
-                                                "memory": data_serverless_yaml["provider"]["memorySize"],
-                                                "timeout": data_serverless_yaml["provider"]["timeout"],
-                                                "cluster_name": cluster_name,
-                                                "endpoint": "https://" + data_serverless_yaml["provider"][
-                                                    "region"] + "-" +
-                                                            data_serverless_yaml["provider"]["project"] +
-                                                            ".cloudfunctions.net/" +
-                                                            data_serverless_yaml['service'] + "-dev-" + function,
-                                                "provider": provider
-                                            }
-                                        functions_meta.append({function: function_meta})
-
-                                except yaml.YAMLError as exc:
-                                    print(exc)
-                            break
-            return data['name']
-        except yaml.YAMLError as exc:
-            print(exc)
+async def deploy_to_clusters(config: Config, provider: str, cluster_obj: BaseDeployment = None,
+                       providers_list: list = None, all_clusters: bool = False,
+                       scheduler: DeploymentScheduler = None, force: bool = False):
+    jobs = []
+    for cluster, curr_cluster, path_function in expand_plan(config, provider, providers_list, all_clusters):
+        jobs.append((provider, cluster, function_name(path_function),
+                     cluster_obj.deploy(curr_cluster, path_function, cluster, force)))
+    await scheduler.run_all(jobs)
+
 
+async def collect_from_clusters(config: Config, provider: str, cluster_collector_obj: "BaseCollector" = None,
+                       providers_list: list = None, all_clusters: bool = False):
+    for cluster_name, curr_cluster in config.select(provider, providers_list, all_clusters):
+        with log_context(provider=provider, cluster_name=cluster_name):
+            dt = datetime.now()
+            seconds = int(dt.strftime('%s'))
+            try:
+                df = await cluster_collector_obj.collect(curr_cluster, cluster_name, seconds - 2*60*60, seconds)
+            except Exception:
+                logger.exception("Collecting %s/%s failed", provider, cluster_name)
+                continue
+            log_frame(logger, df, provider + "/" + cluster_name)
+
+
+async def remove_from_clusters(config: Config, provider: str, cluster_obj: BaseDeployment = None,
+                               providers_list: list = None, all_clusters: bool = False,
+                               scheduler: DeploymentScheduler = None):
+    jobs = []
+    for cluster, curr_cluster, path_function in expand_plan(config, provider, providers_list, all_clusters):
+        jobs.append((provider, cluster, function_name(path_function),
+                     cluster_obj.delete(curr_cluster, path_function, cluster)))
+    await scheduler.run_all(jobs)
+
+
+def get_function_meta(config: Config, provider: str, providers_list: list = None, all_clusters: bool = False,
+                      endpoint_registry: EndpointRegistry = None):
+
+    for cluster, curr_cluster, path_function in expand_plan(config, provider, providers_list, all_clusters):
+        serverless_yaml = rendered_serverless_yaml_path(path_function, provider, cluster)
+        name = deployment_name(cluster, path_function)
+
+        with open(serverless_yaml, 'r') as yaml_stream:
+            try:
+                data_serverless_yaml = yaml.safe_load(yaml_stream)
+
+                for function in data_serverless_yaml["functions"]:
+                    if provider == "aws":
+                        function_meta = {
+                            "memory": data_serverless_yaml["provider"]["memorySize"],
+                            "timeout": data_serverless_yaml["provider"]["timeout"],
+                            "endpoint": endpoint_registry.get(provider, name, function),
+                            "provider": provider,
+                            "cluster_name": cluster
+                        }
+                    elif provider == "openwhisk":
+                        function_meta = {
+                            "memory": data_serverless_yaml["provider"]["memory"],
+                            "timeout": data_serverless_yaml["provider"]["timeout"],
+                            "cluster_name": cluster,
+                            "endpoint": "https://" + curr_cluster["auth"]["ow_api_host"] +
+                                        "/api/v1/web/guest/default/" +
+                                        data_serverless_yaml['service'] + "-dev-" + function,
+                            "provider": provider
+                        }
+                    elif provider == "google":
+                        function_meta = {
+                            "memory": data_serverless_yaml["provider"]["memorySize"],
+                            "timeout": data_serverless_yaml["provider"]["timeout"],
+                            "cluster_name": cluster,
+                            "endpoint": "https://" + data_serverless_yaml["provider"][
+                                "region"] + "-" +
+                                        data_serverless_yaml["provider"]["project"] +
+                                        ".cloudfunctions.net/" +
+                                        data_serverless_yaml['service'] + "-dev-" + function,
+                            "provider": provider
+                        }
+                    functions_meta.append({function: function_meta})
+
+            except yaml.YAMLError as exc:
+                print(exc)
 
 
 async def main(argv):
-    openwhisk_obj = OpenWhiskDeployment()
-    google_obj = GoogleDeployment()
-    aws_obj = AWSDeployment()
-    google_data_collector = GCFCollector()
+    dependency_cache = DependencyCache()
+    deployment_state = DeploymentState()
+    artifact_cache = ArtifactCache()
+    endpoint_registry = EndpointRegistry()
     configfile = ''
     all_providers = False
     ow_providers_list = []
@@ -226,17 +124,25 @@ async def main(argv):
     remove = False
     meta = False
     collect = False
+    max_parallel = 8
+    force = False
+    record_timings = False
+    max_parallel_per_provider = {}
 
     try:
-        arguments, values = getopt.getopt(argv, "hc:ao:g:l:drtm", ["help", "configfile=", "all_providers",
-                                                                 "ow_providers_list=", "gcf_providers_list=",
-                                                                 "aws_providers_list=",
-                                                                 "deploy", "remove", "collect", "get_meta_data"])
+        arguments, values = getopt.getopt(argv, "hc:ao:g:l:drtmp:f", ["help", "configfile=", "all_providers",
+                                                                   "ow_providers_list=", "gcf_providers_list=",
+                                                                   "aws_providers_list=",
+                                                                   "deploy", "remove", "collect", "get_meta_data",
+                                                                   "max-parallel=", "max-parallel-provider=",
+                                                                   "force", "record-timings"])
     except getopt.GetoptError:
         print('main.py -c <configfile path> -a <for all providers> '
               '-o <OW provider_list separated by comma> -g <GCF provider_list separated by comma>  '
               '-l <AWS provider_list separated by comma> -m <for saving functions meta data in a file>'
-              '-d <for deploying> -r <for removing> -t <for collecting data>')
+              '-d <for deploying> -r <for removing> -t <for collecting data> '
+              '-p <max parallel deployments> --max-parallel-provider <provider=limit separated by comma> '
+              '-f <deploy unchanged clusters too> --record-timings <write deployment timings to influxdb>')
         sys.exit(2)
 
     for current_argument, current_value in arguments:
@@ -244,7 +150,11 @@ async def main(argv):
             print('python3 main.py \n -c <configfile path> \n -a <for all providers> '
                   '\n -o <OW provider_list separated by comma> \n -g <GCF provider_list separated by comma>'
                   '\n -l <AWS provider_list separated by comma> \n -m <for saving functions meta data in a file> '
-                  '\n -d <for deploying> \n -r <for removing> \n -t <for collecting data>')
+                  '\n -d <for deploying> \n -r <for removing> \n -t <for collecting data>'
+                  '\n -p, --max-parallel <max parallel deployments, default 8>'
+                  '\n --max-parallel-provider <provider=limit separated by comma, e.g. aws=2,google=1>'
+                  '\n -f, --force <deploy unchanged clusters too>'
+                  '\n --record-timings <write deployment timings to influxdb>')
         elif current_argument in ("-c", "--configfile"):
             configfile = current_value
         elif current_argument in ("-a", "--all_providers"):
@@ -266,47 +176,65 @@ async def main(argv):
             aws_providers_list = all_arguments
         elif current_argument in ("-m", "--get_meta_data"):
             meta = True
+        elif current_argument in ("-p", "--max-parallel"):
+            max_parallel = int(current_value)
+        elif current_argument in ("-f", "--force"):
+            force = True
+        elif current_argument == "--record-timings":
+            record_timings = True
+        elif current_argument == "--max-parallel-provider":
+            for provider_limit in current_value.split(','):
+                provider, limit = provider_limit.split('=')
+                max_parallel_per_provider[provider.strip()] = int(limit)
+
+    if not (deployment or remove or collect or meta):
+        return
+
+    setup_logging()
 
+    try:
+        config = load_config(configfile)
+        validate_plan(config)
+    except ConfigError as exc:
+        print("Invalid configuration: " + str(exc))
+        sys.exit(2)
 
     tasks: List[asyncio.Task] = []
+    scheduler = DeploymentScheduler(max_parallel, max_parallel_per_provider)
+
+    selected_clusters = {"openwhisk": ow_providers_list, "google": gcf_providers_list, "aws": aws_providers_list}
+    # only the providers with selected clusters are imported
+    providers = [provider for provider, providers_list in selected_clusters.items()
+                 if providers_list or (all_providers and config.clusters(provider))]
+    deployers = {}
+    collectors = []
+    if deployment or remove:
+        for provider in providers:
+            deployers[provider] = get_deployer(provider)(dependency_cache, deployment_state, artifact_cache,
+                                                         endpoint_registry)
 
     if deployment:
-        tasks.append(
-            asyncio.create_task(
-                deploy_to_clusters(configfile, 'openwhisk', openwhisk_obj, ow_providers_list, all_providers)
-            )
-        )
-        tasks.append(
-            asyncio.create_task(
-                deploy_to_clusters(configfile, 'google', google_obj, gcf_providers_list, all_providers)
+        for provider in providers:
+            tasks.append(
+                asyncio.create_task(
+                    deploy_to_clusters(config, provider, deployers[provider], selected_clusters[provider],
+                                       all_providers, scheduler, force)
+                )
             )
-        )
-        tasks.append(
-            asyncio.create_task(
-                deploy_to_clusters(configfile, 'aws', aws_obj, aws_providers_list, all_providers)
-            )
-        )
     elif remove:
-        tasks.append(
-            asyncio.create_task(
-                remove_from_clusters(configfile, 'openwhisk', openwhisk_obj, ow_providers_list, all_providers)
-            )
-        )
-        tasks.append(
-            asyncio.create_task(
-                remove_from_clusters(configfile, 'google', google_obj, gcf_providers_list, all_providers)
+        for provider in providers:
+            tasks.append(
+                asyncio.create_task(
+                    remove_from_clusters(config, provider, deployers[provider], selected_clusters[provider],
+                                         all_providers, scheduler)
+                )
             )
-        )
-        tasks.append(
-            asyncio.create_task(
-                remove_from_clusters(configfile, 'aws', aws_obj, aws_providers_list, all_providers)
-            )
-        )
 
-    elif collect:
+    elif collect and "google" in providers:
+        collectors.append(get_collector('google')())
         tasks.append(
             asyncio.create_task(
-                collect_from_clusters(configfile, 'google', google_data_collector, gcf_providers_list, all_providers)
+                collect_from_clusters(config, 'google', collectors[-1], gcf_providers_list, all_providers)
             )
         )
 
@@ -321,14 +249,23 @@ async def main(argv):
 
         print("All deployment/removal finished")
 
+    for collector in collectors:
+        await collector.close()
+
+    if record_timings and (deployment or remove):
+        from InfluxDBWriter import InfluxDBWriter
+        influx_db_writer_obj = InfluxDBWriter(config)
+        influx_db_writer_obj.write_deployment_timings([record for deployer in deployers.values()
+                                                       for record in deployer.timings])
+
     if meta:
-        file_name = get_function_meta(configfile, 'openwhisk', ow_providers_list, all_providers)
-        get_function_meta(configfile, 'google', gcf_providers_list, all_providers)
-        get_function_meta(configfile, 'aws', aws_providers_list, all_providers)
+        for provider, providers_list in selected_clusters.items():
+            get_function_meta(config, provider, providers_list, all_providers, endpoint_registry)
         d = {}
-        for k in functions_meta[0].keys():
-            d[k] = tuple(d[k] for d in functions_meta)
-        with open('MetaInfo/' + file_name + '.json', 'w') as fp:
+        for function_meta in functions_meta:
+            for k, v in function_meta.items():
+                d.setdefault(k, []).append(v)
+        with open('MetaInfo/' + config.name + '.json', 'w') as fp:
             json.dump(d, fp, indent=4)
 
 if __name__ == "__main__":